@@ -1,28 +1,36 @@
-from fastapi import FastAPI, Request, WebSocket, Response, WebSocketDisconnect
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-import json
-import anthropic
-from pydantic import BaseModel, Field
-from typing import Dict, Optional, Any
-import asyncio
-import os
-import time
-import logging
-import httpx
-from vosk import Model, KaldiRecognizer
-from dotenv import load_dotenv
-from contextlib import asynccontextmanager
-from concurrent.futures import ThreadPoolExecutor
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Import other python files
-from profiles import Profile
-from buddy import Buddy
-from livekit_api import setup_livekit_routes
-
+from startup import profiler
+
+with profiler.phase("core_imports"):
+    from fastapi import FastAPI, HTTPException, Request, WebSocket, Response, WebSocketDisconnect
+    from fastapi.middleware.cors import CORSMiddleware
+    import json
+    from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+    from typing import Annotated, Dict, Optional, Any
+    import asyncio
+    import os
+    import time
+    import logging
+    from contextlib import asynccontextmanager
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Import other python files
+    from admission import AdmissionController, CLOSE_TRY_AGAIN_LATER, DEFAULT_ROOM
+    from config import get_settings
+    from heartbeat import HeartbeatManager
+    from Profiles import Profile
+    from Buddy import Buddy
+    from livekit_api import create_participant_token, setup_livekit_routes
+    from room_agent import RoomAgentManager
+
+# Load environment variables and logging config once for the whole process
+with profiler.phase("config"):
+    settings = get_settings()
+profiler.enabled = settings.startup_profile
+
+
+# Scalar profile fields pushed to the client as soon as they stream in; the profile
+# itself is only committed later, from the complete validated state
+EARLY_PROFILE_FIELDS = ("interest", "confidence")
 
 FILLER_WORDS = {"um", "uh", "like", "so", "you know", "actually", "basically", "literally", "well", "right"}
 
@@ -36,11 +44,17 @@ class ProfileState(BaseModel):
     interest: float = Field(..., ge=0, le=1, description="Current interest level in the topic")
     confidence: float = Field(..., ge=0, le=1, description="Confidence in understanding of current discussion")
 
+# Early fields are checked against the same bounds as ProfileState before they are pushed
+EARLY_FIELD_VALIDATORS = {
+    name: TypeAdapter(Annotated[(ProfileState.model_fields[name].annotation, *ProfileState.model_fields[name].metadata)])
+    for name in EARLY_PROFILE_FIELDS
+}
+
 # Lifespan context manager for startup and shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global buddy, prompt_template, executor
+    global buddy, prompt_template, executor, room_agents
     print("Backend server is starting up!")
     
     # Initialize ThreadPoolExecutor for audio processing
@@ -48,12 +62,19 @@ async def lifespan(app: FastAPI):
     print("ThreadPoolExecutor initialized for audio processing")
     
     # Load the Vosk model in the background
-    asyncio.create_task(load_vosk_model())
+    vosk_loading = asyncio.create_task(load_vosk_model())
+
+    room_agents = RoomAgentManager(settings.livekit_url, create_participant_token, create_participant_service,
+                                   executor=executor, admission=admission, identity=settings.agent_identity)
+    if settings.agent_rooms:
+        asyncio.create_task(join_agent_rooms(vosk_loading))
+
+    heartbeats.start()
     
     try:
-        with open("prompts/base.xml", "r") as f:
-            prompt_template = f.read()
-            print("Loaded prompt template")
+        with profiler.phase("prompt_template"):
+            prompt_template = load_prompt_template()
+        print("Loaded prompt template")
     except Exception as e:
         print(f"Error loading prompt template: {e}")
         return
@@ -61,53 +82,103 @@ async def lifespan(app: FastAPI):
     buddy = Buddy()
     print("Buddy initialized")
     print("Ready to accept connections and create profiles dynamically")
+    profiler.mark_ready()
     
     yield
     
     # Shutdown
     print("Backend server is shutting down.")
+    await heartbeats.stop()
+    if room_agents:
+        await room_agents.stop()
     if executor:
         executor.shutdown(wait=True)
         print("ThreadPoolExecutor shutdown complete")
+    if llm_router:
+        await llm_router.close()
+
+
+def create_app() -> FastAPI:
+    """Build the FastAPI application. Heavy dependencies are only imported on first use."""
+    with profiler.phase("create_app"):
+        app = FastAPI(lifespan=lifespan)
+
+        # Add CORS middleware to allow frontend requests
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],  # Allow all origins for ngrok compatibility
+            allow_credentials=False,  # Must be False when allow_origins is "*"
+            allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            allow_headers=["*"],
+            expose_headers=["*"],
+        )
 
-app = FastAPI(lifespan=lifespan)
+        app.add_api_route("/test", test_endpoint, methods=["GET"])
+        app.add_api_route("/status", status_endpoint, methods=["GET"])
+        app.add_api_route("/process", receive_data, methods=["POST"])
+        app.add_api_websocket_route("/ws/transcribe/{participant_identity}", websocket_transcribe)
+        app.add_api_route("/agent/rooms/{room_name}", join_room_endpoint, methods=["POST"])
+        app.add_api_route("/agent/rooms/{room_name}", leave_room_endpoint, methods=["DELETE"])
 
-# Add CORS middleware to allow frontend requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins for ngrok compatibility
-    allow_credentials=False,  # Must be False when allow_origins is "*"
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
+        # Setup LiveKit API routes
+        setup_livekit_routes(app)
+    return app
 
 
 # Test endpoint to verify server is running updated code
-@app.get("/test")
 async def test_endpoint():
     return {"message": "Server updated successfully!", "timestamp": "2025-09-13-18:11"}
 
+# Room agents: transcribe a LiveKit room server-side
+async def join_agent_rooms(vosk_loading: asyncio.Task):
+    # Agents start transcribing as soon as they join, so wait for the recognizer first
+    await vosk_loading
+    if vosk_model is None:
+        logger.error(f"Not joining {settings.agent_rooms}: speech recognition model is unavailable")
+        return
+    for room_name in settings.agent_rooms:
+        try:
+            # Keep retrying in the background if the LiveKit server isn't reachable yet
+            await room_agents.join(room_name, retry=True)
+        except Exception as e:
+            logger.error(f"Room agent failed to join {room_name}: {e}")
+
+async def join_room_endpoint(room_name: str):
+    if vosk_model is None:
+        raise HTTPException(status_code=503, detail="Speech recognition model is still loading")
+    try:
+        agent = await room_agents.join(room_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Room agent failed to join {room_name}: {e}")
+    return {"room": room_name, **agent.status()}
+
+async def leave_room_endpoint(room_name: str):
+    if not await room_agents.leave(room_name):
+        raise HTTPException(status_code=404, detail=f"No room agent in {room_name}")
+    return {"room": room_name, "left": True}
+
 # Status endpoint to check if Vosk model is loaded
-@app.get("/status")
 async def status_endpoint():
-    return {
+    status = {
         "server": "running",
         "vosk_model_loaded": vosk_model is not None,
         "executor_available": executor is not None,
         "active_sessions": len(active_sessions),
-        "profiles": len(profiles_by_name)
+        "profiles": len(profiles_by_name),
+        "load": admission.status(),
+        "heartbeat": heartbeats.status()
     }
-
-client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-# Setup LiveKit API routes
-setup_livekit_routes(app)
+    if llm_router:
+        status["llm"] = llm_router.status()
+    if room_agents and room_agents.agents:
+        status["agents"] = room_agents.status()
+    if profiler.enabled:
+        status["startup"] = profiler.report()
+    return status
 
 # Constants
-VOSK_MODEL_PATH = "vosk-model"
-VOSK_SAMPLE_RATE = 16000
-ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
+VOSK_MODEL_PATH = settings.vosk_model_path
+VOSK_SAMPLE_RATE = settings.vosk_sample_rate
 
 # Global variables
 profiles_by_name = {}  # Dictionary to store profiles by participant identity
@@ -116,11 +187,33 @@ buddy = None
 prompt_template = None
 vosk_model = None  # Will be loaded asynchronously
 executor = None  # ThreadPoolExecutor for audio processing
+llm_router = None  # LLMRouter, created on first use
+admission = AdmissionController.from_settings(settings)  # Session/recognizer/LLM limits and load shedding
+heartbeats = HeartbeatManager(settings.heartbeat_interval, settings.idle_timeout)  # Pings and idle timeouts for all sessions
+room_agents = None  # RoomAgentManager for server-side LiveKit ingest, created at startup
 
 # LOGGING
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def load_prompt_template() -> str:
+    with open(settings.prompt_path, "r") as f:
+        return f.read()
+
+
+def get_llm_router():
+    """Create the LLM router on first use so importing Main stays cheap."""
+    global llm_router
+    if llm_router is None:
+        llm_router_module = profiler.lazy_import("llm_router")
+        llm_router = llm_router_module.LLMRouter.from_settings(settings)
+    return llm_router
+
+
+def _load_vosk(path: str):
+    vosk = profiler.lazy_import("vosk")
+    return vosk.Model(path)
+
 # Asynchronous Vosk model loading
 async def load_vosk_model():
     global vosk_model
@@ -130,24 +223,27 @@ async def load_vosk_model():
             return
         
         logger.info("Starting to load Vosk model asynchronously...")
-        # Run the model loading in a thread pool to avoid blocking
+        # Run the import and model loading in a thread pool to avoid blocking
         loop = asyncio.get_event_loop()
-        vosk_model = await loop.run_in_executor(None, Model, VOSK_MODEL_PATH)
+        with profiler.phase("vosk_model_load"):
+            vosk_model = await loop.run_in_executor(None, _load_vosk, VOSK_MODEL_PATH)
         logger.info("Vosk model loaded successfully")
     except Exception as e:
         logger.error(f"Failed to load Vosk model: {e}")
 
+def heuristic_emotion(profile: Dict[str, Any]) -> str:
+    """Local stand-in for the emotion model when no LLM route is healthy."""
+    if profile.get("wps", 0) >= 5:
+        return "slow"
+    if profile.get("filler_words", 0) >= 4:
+        return "confused"
+    return profile.get("current_emotion") or "idle"
+
 # LLM helper
 async def get_emotion_from_text(text: str, profile: Dict[str, Any]) -> str:
     if not text.strip():
         return "idle"
 
-    headers = {
-        "x-api-key": os.getenv("ANTHROPIC_API_KEY"),
-        "anthropic-version": "2023-06-01",
-        "content-type": "application/json"
-    }
-
     profile_context = json.dumps(profile, indent=2)
     prompt = (
         "Analyze the emotion of the following speech given the user's profile and memory. In addition, note that if wps is high (>= 5) we probably want to react with slow emotion, if filler is high (>= 4) we would probably want confused, etc.\n\n"
@@ -157,36 +253,33 @@ async def get_emotion_from_text(text: str, profile: Dict[str, Any]) -> str:
         "Make sure there is ABSOLUTELY NO punctuation, extra words, newlines, etc. Note that the emotion should only change from the previous emotion that was provided around 40 percent of the time, with idle being a default state if it seems nothing is needed.\n\n"
     )
 
-    payload = {
-        "model": "claude-3-7-sonnet-20250219",
-        "max_tokens": 10,
-        "messages": [{"role": "user", "content": prompt}]
-    }
+    response_text = await get_llm_router().complete("emotion", prompt, max_tokens=10)
+    if response_text is None:
+        emotion = heuristic_emotion(profile)
+        logger.info(f"Heuristic emotion analysis: '{text}' -> '{emotion}'")
+        return emotion
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(ANTHROPIC_API_URL, json=payload, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            emotion = result.get('content', [{}])[0].get('text', 'speaking').strip().lower()
-            logger.info(f"LLM emotion analysis: '{text}' with profile -> '{emotion}'")
-            return emotion
-    except Exception as e:
-        logger.error(f"Emotion analysis error: {e}")
-        return "speaking"
+    emotion = response_text.strip().lower()
+    logger.info(f"LLM emotion analysis: '{text}' with profile -> '{emotion}'")
+    return emotion
 
 # TranscriptionService factory
-def create_transcription_service(profile: Profile):
+def create_transcription_service(profile: Profile, emit=None, room: str = DEFAULT_ROOM):
     from services import TranscriptionService
     try:
         if vosk_model is None:
             logger.warning("Vosk model not yet loaded, transcription service will not be available")
             return None
-        return TranscriptionService(vosk_model, VOSK_SAMPLE_RATE, process_data, profile)
+        return TranscriptionService(vosk_model, VOSK_SAMPLE_RATE, process_data, profile, emit=emit,
+                                    admission=admission, room=room)
     except ValueError as e:
         logger.error(f"Cannot create transcription service: {e}")
         return None
 
+def create_participant_service(identity: str, emit, room: str):
+    """TranscriptionService for a LiveKit participant transcribed by a room agent."""
+    return create_transcription_service(get_or_create_profile(identity), emit=emit, room=room)
+
 # On server startup
 def get_or_create_profile(identity: str) -> Profile:
     """Gets an existing profile or creates a new one for a user."""
@@ -212,8 +305,101 @@ def get_or_create_profile(identity: str) -> Profile:
     return new_profile
 
 
+async def stream_profile_state(formatted_prompt: str, emit, timestamp: float) -> Optional[Dict[str, Any]]:
+    """Stream the profile update, pushing interest/confidence to the client as soon as each is parsed.
+
+    Returns the complete state once the JSON object closes, or None if no route answered.
+    The profile itself is only committed by the caller from the complete state.
+    """
+    from incremental_json import IncrementalJSONParser
+
+    parser = IncrementalJSONParser()
+    deltas = get_llm_router().stream("profile", formatted_prompt, max_tokens=1000)
+    try:
+        async for text in deltas:
+            for key, value in parser.feed(text):
+                if emit and key in EARLY_PROFILE_FIELDS:
+                    try:
+                        value = EARLY_FIELD_VALIDATORS[key].validate_python(value)
+                    except ValidationError:
+                        logger.warning(f"Not pushing out-of-range early profile field {key}={value!r}")
+                        continue
+                    await emit({"type": "profile", key: value, "timestamp": timestamp})
+            if parser.done:
+                break
+    finally:
+        await deltas.aclose()
+
+    if not parser.buffer:
+        return None
+    print(f"Raw response: {parser.buffer}")
+    return parser.result()
+
+
+async def analyze_with_llm(profile: Profile, message: str, timestamp: float, previous_state: Dict[str, Any],
+                           filler_count: int, emit=None) -> str:
+    """Run the profile update and emotion calls for one utterance; returns the emotion."""
+    formatted_prompt = prompt_template.replace("{{frontend_message}}", str(message))
+    formatted_prompt = formatted_prompt.replace("{{previous_state_json}}", json.dumps(previous_state, indent=2))
+
+    # The emotion call only needs the previous state, so run it alongside the profile update
+    async def analyze_emotion():
+        emotion = await get_emotion_from_text(message, previous_state)
+        if emit:
+            await emit({"type": "emotion", "current_emotion": emotion, "timestamp": timestamp})
+        return emotion
+
+    emotion_task = asyncio.create_task(analyze_emotion())
+
+    try:
+        print(f"Trying to send to LLM with previous state: {previous_state}")
+        if settings.llm_streaming:
+            state_dict = await stream_profile_state(formatted_prompt, emit, timestamp)
+        else:
+            response_text = await get_llm_router().complete("profile", formatted_prompt, max_tokens=1000)
+            state_dict = json.loads(response_text) if response_text is not None else None
+
+        if state_dict is None:
+            # No healthy route: keep the previous profile; the emotion falls back on its own
+            print("Profile update unavailable, keeping previous state")
+        else:
+            print("LLM response received")
+            updated_state = ProfileState(
+                profession=state_dict['profession'],
+                memory=state_dict['memory'],
+                understanding_threshold=state_dict['understanding_threshold'],
+                wps=profile.wps,
+                filler_words=filler_count,  # Use calculated value instead of LLM response
+                interest=state_dict['interest'],
+                confidence=state_dict['confidence']
+            )
+            print(f"Updated response parsed: {updated_state}")
+
+            profile.profession = updated_state.profession
+            profile.memory = updated_state.memory
+            profile.understanding_threshold = updated_state.understanding_threshold
+            profile.wps = updated_state.wps
+            profile.filler_words = updated_state.filler_words
+            profile.interest = updated_state.interest
+            profile.confidence = updated_state.confidence
+
+    except Exception as e:
+        print("Error during LLM processing or profile update!")
+        print(f"Error: {e}")
+
+    emotion = await emotion_task
+    profile.current_emotion = emotion
+    print(f"Updated user profile state: {profile}")
+    return emotion
+
+
 # Process data
-async def process_data(data):
+async def process_data(data, emit=None):
+    """Update the speaker's profile and pick a reaction for one final transcript.
+
+    emit, when given, is an async callable used to push early results (the
+    emotion, and with LLM_STREAMING the interest/confidence) before this returns.
+    """
     global profiles_by_name, buddy, prompt_template
     print("Processing data:")
 
@@ -247,62 +433,24 @@ async def process_data(data):
             "profession": profile.profession,
             "memory": profile.memory,
             "understanding_threshold": profile.understanding_threshold,
+            "wps": profile.wps,
             "filler_words": filler_count,  # Use the calculated value
             "interest": profile.interest,
             "confidence": profile.confidence,
             "current_emotion": profile.current_emotion
         }
 
-        formatted_prompt = prompt_template.replace("{{frontend_message}}", str(message))
-        formatted_prompt = formatted_prompt.replace("{{previous_state_json}}", json.dumps(previous_state, indent=2))
-
-        try:
-            print(f"Trying to send to LLM with previous state: {previous_state}")
-            response = client.messages.create(
-                model="claude-3-7-sonnet-20250219",
-                max_tokens=1000,
-                messages=[{"role": "user", "content": formatted_prompt}]
-            )
-            print("LLM response received")
-
-            response_text = response.content[0].text
-            print(f"Raw response: {response_text}")
-
-            # Parse the response text into a dictionary
+        room = data.get("room", DEFAULT_ROOM)
+        if admission.acquire_llm(room):
             try:
-                state_dict = json.loads(response_text)
-                updated_state = ProfileState(
-                    profession=state_dict['profession'],
-                    memory=state_dict['memory'],
-                    understanding_threshold=state_dict['understanding_threshold'],
-                    wps=profile.wps,
-                    filler_words=filler_count,  # Use calculated value instead of LLM response
-                    interest=state_dict['interest'],
-                    confidence=state_dict['confidence']
-                )
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response: {e}")
-                raise
-
-            print(f"Updated response parsed: {updated_state}")
-
-            profile.profession = updated_state.profession
-            profile.memory = updated_state.memory
-            profile.understanding_threshold = updated_state.understanding_threshold
-            profile.wps = updated_state.wps
-            profile.filler_words = updated_state.filler_words
-            profile.interest = updated_state.interest
-            profile.confidence = updated_state.confidence
-
-            emotion = await get_emotion_from_text(message, previous_state)
+                emotion = await analyze_with_llm(profile, message, timestamp, previous_state, filler_count, emit)
+            finally:
+                admission.release_llm(room)
+        else:
+            # Shed under load: react from local heuristics and keep the previous profile
+            emotion = heuristic_emotion(previous_state)
             profile.current_emotion = emotion
 
-            print(f"Updated user profile state: {profile}")
-
-        except Exception as e:
-            print("Error during LLM processing or profile update!")
-            print(f"Error: {e}")
-
     return {"emotion": emotion}
 
 def parse_data(data):
@@ -311,23 +459,43 @@ def parse_data(data):
     timestamp = data.get("timestamp", 0)
     return profile_name, message, timestamp
 
-@app.post("/process")
 async def receive_data(request: Request):
     data = await request.json()
     print("Data received:", data)
     result = await process_data(data)
     return {"status": "success", "emotion": result["emotion"]}
 
-@app.websocket("/ws/transcribe/{participant_identity}")
 async def websocket_transcribe(websocket: WebSocket, participant_identity: str):
     await websocket.accept()
     print(f"Client connected for transcription: {websocket.client} (identity: {participant_identity})")
 
+    # Refuse new sessions under overload with a retryable close code
+    room = websocket.query_params.get("room", DEFAULT_ROOM)
+    refusal = admission.admit_session(room)
+    if refusal:
+        print(f"Refusing session for {participant_identity} in room {room}: {refusal}")
+        await websocket.send_text(json.dumps({"type": "error", "message": f"Server busy ({refusal}), please retry"}))
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="Server overloaded, retry later")
+        return
+
     # Get or create a profile for the connected user
     user_profile = get_or_create_profile(participant_identity)
 
-    transcription_service = create_transcription_service(user_profile)
+    # Sequence number of the frame being processed, echoed on every result for latency measurement
+    current_seq = None
+
+    async def emit(message):
+        # Early results (emotion, streamed profile fields) pushed while a final is still processing
+        if current_seq is not None:
+            message["seq"] = current_seq
+        try:
+            await websocket.send_text(json.dumps(message))
+        except Exception as e:
+            print(f"Failed to push early result to {participant_identity}: {e}")
+
+    transcription_service = create_transcription_service(user_profile, emit=emit, room=room)
     if not transcription_service:
+        admission.release_session(room)
         if vosk_model is None:
             await websocket.send_text(json.dumps({
                 "type": "error",
@@ -345,50 +513,59 @@ async def websocket_transcribe(websocket: WebSocket, participant_identity: str):
     active_sessions[participant_identity] = transcription_service
     print(f"Session created for {participant_identity}")
 
-    # Create a background task to send periodic pings
-    async def ping_task():
-        while True:
-            try:
-                await asyncio.sleep(10)  # Send ping every 10 seconds
-                if websocket.client_state == websocket.client_state.CONNECTED:
-                    print(f"Sending ping to {participant_identity}")
-                    await websocket.send_text(json.dumps({"type": "ping"}))
-                else:
-                    break
-            except Exception as e:
-                print(f"Ping task error for {participant_identity}: {e}")
-                break
-
-    # Start the ping task in the background
-    ping_job = asyncio.create_task(ping_task())
+    # Pings and the idle timeout are handled by the shared heartbeat sweep
+    heartbeat = heartbeats.register(websocket, participant_identity)
 
     try:
         while True:
-            try:
-                # Receive text messages (JSON format from frontend)
-                message = await asyncio.wait_for(websocket.receive_text(), timeout=30.0)
-                
+            # Text frames carry JSON; binary frames carry raw audio in the session's declared format
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            heartbeat.touch()
+
+            audio_bytes = message.get("bytes")
+            if audio_bytes is not None:
+                current_seq = None
+            else:
                 try:
-                    data = json.loads(message)
-                    if "bytes" in data:
-                        # Handle audio data from frontend
-                        audio_bytes = bytes(data["bytes"])
-                        print(f"Received audio data from {participant_identity}: {len(audio_bytes)} bytes")
-                        
-                        result = await transcription_service.process_audio(audio_bytes, executor)
-                        if result:
-                            await websocket.send_text(json.dumps(result))
-                    elif data.get('type') == 'pong':
-                        print(f"Received pong from {participant_identity}")
-                    else:
-                        print(f"Received unexpected message from {participant_identity}: {data}")
+                    data = json.loads(message.get("text") or "")
                 except json.JSONDecodeError:
-                    print(f"Invalid JSON message from {participant_identity}: {message}")
-                            
-            except asyncio.TimeoutError:
-                # Connection has been idle for too long
-                print(f"Connection timeout for {participant_identity}, closing connection")
-                break
+                    print(f"Invalid JSON message from {participant_identity}: {message.get('text')}")
+                    continue
+
+                if "bytes" in data:
+                    # Handle audio data from frontend
+                    current_seq = data.get("seq")
+                    audio_bytes = bytes(data["bytes"])
+                elif data.get('type') == 'config':
+                    # Declares the client's native audio format; conversion to 16 kHz mono int16 happens here
+                    audio = profiler.lazy_import("audio")
+                    try:
+                        audio_format = audio.AudioFormat.from_message(data)
+                    except ValueError as e:
+                        await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
+                        continue
+                    transcription_service.set_audio_format(audio_format)
+                    print(f"Audio format for {participant_identity}: {audio_format.to_dict()}")
+                    await websocket.send_text(json.dumps({"type": "config", "status": "ok", **audio_format.to_dict()}))
+                elif data.get('type') == 'pong':
+                    print(f"Received pong from {participant_identity}")
+                else:
+                    print(f"Received unexpected message from {participant_identity}: {data}")
+
+            if audio_bytes is not None:
+                print(f"Received audio data from {participant_identity}: {len(audio_bytes)} bytes")
+
+                result = await transcription_service.process_audio(audio_bytes, executor)
+                if result:
+                    # Echo the client's frame sequence number so load tests can measure latency
+                    if current_seq is not None:
+                        result["seq"] = current_seq
+                    await websocket.send_text(json.dumps(result))
+
+            # Time spent on a slow final (LLM analysis) shouldn't count as idle
+            heartbeat.touch()
 
     except WebSocketDisconnect:
         print(f"Client disconnected gracefully: {websocket.client} (identity: {participant_identity})")
@@ -402,12 +579,15 @@ async def websocket_transcribe(websocket: WebSocket, participant_identity: str):
         except:
             pass
     finally:
-        # Cancel the ping task
-        ping_job.cancel()
+        heartbeats.unregister(heartbeat)
         # Clean up the session
+        admission.release_session(room)
         if participant_identity in active_sessions:
             del active_sessions[participant_identity]
         print(f"Client disconnected: {websocket.client} (identity: {participant_identity})")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8001)
+    import uvicorn
+
+    # Equivalent to: uvicorn --factory Main:create_app
+    uvicorn.run(create_app(), host=settings.host, port=settings.port)
@@ -0,0 +1,219 @@
+"""Admission control and load shedding for transcription sessions.
+
+Tracks sessions, recognizer chunks in flight and concurrent LLM analyses,
+globally and per room. As the recognizer backlog grows, sessions degrade in
+order: partial results are skipped first, then LLM analysis, and then new
+sessions are refused with a retryable close code. Those decisions use a
+smoothed backlog so momentary spikes don't flip them; refusing new sessions
+below full capacity keeps headroom so admitted sessions rarely reach the hard
+limit, where their audio chunks are dropped.
+"""
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+DEFAULT_ROOM = "default"
+
+# WebSocket close code for "Try Again Later"
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class SmoothedLevel:
+    """Time-weighted moving average of a level that changes in steps (e.g. chunks in flight)."""
+
+    def __init__(self, tau: float, clock=time.monotonic):
+        self.tau = tau
+        self.clock = clock
+        self.level = 0
+        self.value = 0.0
+        self.updated = clock()
+
+    def _advance(self):
+        now = self.clock()
+        decay = math.exp(-(now - self.updated) / self.tau) if self.tau > 0 else 0.0
+        self.value = self.level + (self.value - self.level) * decay
+        self.updated = now
+
+    def set(self, level: int):
+        self._advance()
+        self.level = level
+
+    def get(self) -> float:
+        self._advance()
+        return self.value
+
+
+class AdmissionController:
+    def __init__(self, max_sessions: int = 200, max_sessions_per_room: int = 50,
+                 max_queued_chunks: int = 64, max_queued_chunks_per_room: int = 16,
+                 max_llm_calls: int = 32, max_llm_calls_per_room: int = 8,
+                 shed_partials_at: float = 0.5, shed_llm_at: float = 0.8, refuse_sessions_at: float = 0.9,
+                 smoothing: float = 2.0, clock=time.monotonic):
+        if not refuse_sessions_at < 1.0:
+            raise ValueError("refuse_sessions_at must be below 1.0, where admitted sessions start dropping audio")
+        self.max_sessions = max_sessions
+        self.max_sessions_per_room = max_sessions_per_room
+        self.max_queued_chunks = max_queued_chunks
+        self.max_queued_chunks_per_room = max_queued_chunks_per_room
+        self.max_llm_calls = max_llm_calls
+        self.max_llm_calls_per_room = max_llm_calls_per_room
+        self.shed_partials_at = shed_partials_at
+        self.shed_llm_at = shed_llm_at
+        self.refuse_sessions_at = refuse_sessions_at
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.sessions = 0
+        self.queued_chunks = 0
+        self.llm_calls = 0
+        self.room_sessions: Dict[str, int] = defaultdict(int)
+        self.room_chunks: Dict[str, int] = defaultdict(int)
+        self.room_llm_calls: Dict[str, int] = defaultdict(int)
+        # Smoothed chunks in flight, globally and per room
+        self.smoothed_chunks = SmoothedLevel(smoothing, clock)
+        self.room_smoothed_chunks: Dict[str, SmoothedLevel] = {}
+        self.shed = {
+            "refused_sessions": 0,
+            "dropped_chunks": 0,
+            "skipped_partials": 0,
+            "skipped_llm": 0,
+        }
+
+    @classmethod
+    def from_settings(cls, settings) -> "AdmissionController":
+        return cls(
+            max_sessions=settings.max_sessions,
+            max_sessions_per_room=settings.max_sessions_per_room,
+            max_queued_chunks=settings.max_queued_chunks,
+            max_queued_chunks_per_room=settings.max_queued_chunks_per_room,
+            max_llm_calls=settings.max_llm_calls,
+            max_llm_calls_per_room=settings.max_llm_calls_per_room,
+            shed_partials_at=settings.shed_partials_at,
+            shed_llm_at=settings.shed_llm_at,
+            refuse_sessions_at=settings.refuse_sessions_at,
+            smoothing=settings.pressure_smoothing,
+        )
+
+    def chunk_pressure(self, room: str) -> float:
+        """Instantaneous recognizer backlog as a fraction of the tighter of the global and room limits."""
+        return max(self.queued_chunks / self.max_queued_chunks,
+                   self.room_chunks.get(room, 0) / self.max_queued_chunks_per_room)
+
+    def smoothed_pressure(self, room: str) -> float:
+        """chunk_pressure averaged over the last few seconds; drives the soft degradation steps."""
+        room_level = self.room_smoothed_chunks.get(room)
+        return max(self.smoothed_chunks.get() / self.max_queued_chunks,
+                   (room_level.get() if room_level else 0.0) / self.max_queued_chunks_per_room)
+
+    def _update_smoothed(self, room: str):
+        self.smoothed_chunks.set(self.queued_chunks)
+        if room not in self.room_sessions and not self.room_chunks.get(room):
+            # Room is gone; don't keep its history around
+            self.room_smoothed_chunks.pop(room, None)
+            return
+        if room not in self.room_smoothed_chunks:
+            self.room_smoothed_chunks[room] = SmoothedLevel(self.smoothing, self.clock)
+        self.room_smoothed_chunks[room].set(self.room_chunks.get(room, 0))
+
+    # Sessions
+
+    def admit_session(self, room: str) -> Optional[str]:
+        """Register a new session, or return the reason it was refused."""
+        reason = None
+        if self.sessions >= self.max_sessions:
+            reason = "server session limit reached"
+        elif self.room_sessions.get(room, 0) >= self.max_sessions_per_room:
+            reason = "room session limit reached"
+        elif self.smoothed_pressure(room) >= self.refuse_sessions_at:
+            reason = "speech recognition is saturated"
+
+        if reason:
+            self.shed["refused_sessions"] += 1
+            return reason
+        self.sessions += 1
+        self.room_sessions[room] += 1
+        return None
+
+    def release_session(self, room: str):
+        self.sessions -= 1
+        self.room_sessions[room] -= 1
+        if not self.room_sessions[room]:
+            del self.room_sessions[room]
+            if not self.room_chunks.get(room):
+                self.room_smoothed_chunks.pop(room, None)
+
+    # Recognizer chunks
+
+    def start_chunk(self, room: str) -> bool:
+        """Reserve a recognizer slot for one audio chunk; False means drop the chunk.
+
+        This is the hard limit, so it uses the instantaneous backlog.
+        """
+        if self.chunk_pressure(room) >= 1.0:
+            self.shed["dropped_chunks"] += 1
+            return False
+        self.queued_chunks += 1
+        self.room_chunks[room] += 1
+        self._update_smoothed(room)
+        return True
+
+    def finish_chunk(self, room: str):
+        self.queued_chunks -= 1
+        self.room_chunks[room] -= 1
+        if not self.room_chunks[room]:
+            del self.room_chunks[room]
+        self._update_smoothed(room)
+
+    def skip_partials(self, room: str) -> bool:
+        if self.smoothed_pressure(room) >= self.shed_partials_at:
+            self.shed["skipped_partials"] += 1
+            return True
+        return False
+
+    # LLM analysis (one slot covers the profile and emotion calls for an utterance)
+
+    def acquire_llm(self, room: str) -> bool:
+        """Reserve an LLM slot; False means analyze with local heuristics instead."""
+        if (self.smoothed_pressure(room) >= self.shed_llm_at
+                or self.llm_calls >= self.max_llm_calls
+                or self.room_llm_calls.get(room, 0) >= self.max_llm_calls_per_room):
+            self.shed["skipped_llm"] += 1
+            return False
+        self.llm_calls += 1
+        self.room_llm_calls[room] += 1
+        return True
+
+    def release_llm(self, room: str):
+        self.llm_calls -= 1
+        self.room_llm_calls[room] -= 1
+        if not self.room_llm_calls[room]:
+            del self.room_llm_calls[room]
+
+    def status(self) -> Dict:
+        return {
+            "sessions": self.sessions,
+            "queued_chunks": self.queued_chunks,
+            "llm_calls": self.llm_calls,
+            "smoothed_queued_chunks": round(self.smoothed_chunks.get(), 2),
+            "rooms": {
+                room: {
+                    "sessions": count,
+                    "queued_chunks": self.room_chunks.get(room, 0),
+                    "llm_calls": self.room_llm_calls.get(room, 0),
+                }
+                for room, count in self.room_sessions.items()
+            },
+            "limits": {
+                "sessions": self.max_sessions,
+                "sessions_per_room": self.max_sessions_per_room,
+                "queued_chunks": self.max_queued_chunks,
+                "queued_chunks_per_room": self.max_queued_chunks_per_room,
+                "llm_calls": self.max_llm_calls,
+                "llm_calls_per_room": self.max_llm_calls_per_room,
+                "shed_partials_at": self.shed_partials_at,
+                "shed_llm_at": self.shed_llm_at,
+                "refuse_sessions_at": self.refuse_sessions_at,
+            },
+            "shed": dict(self.shed),
+        }
@@ -0,0 +1,160 @@
+"""Conversion of client audio to the recognizer's 16 kHz mono int16.
+
+Clients declare their native format once per session with a config message:
+
+    {"type": "config", "sample_rate": 48000, "sample_format": "float32", "channels": 2}
+
+Each incoming buffer is then viewed in place with NumPy (no copy), downmixed,
+low-pass filtered when downsampling, resampled by linear interpolation and
+quantized in one vectorized pass. Audio that is already 16 kHz mono int16
+passes through untouched.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+
+# Anti-alias filter for downsampling: flat up to this fraction of the target
+# Nyquist frequency, attenuated by at least ANTIALIAS_ATTENUATION_DB above it
+ANTIALIAS_PASSBAND = 0.85
+ANTIALIAS_ATTENUATION_DB = 60.0
+
+SAMPLE_FORMATS = {
+    "int16": np.dtype("<i2"),
+    "float32": np.dtype("<f4"),
+}
+
+MAX_CHANNELS = 8
+
+
+class AudioFormat:
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, sample_format: str = "int16", channels: int = 1):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Unsupported sample_format {sample_format!r}; expected one of {sorted(SAMPLE_FORMATS)}")
+        if not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"Unsupported sample_rate {sample_rate}")
+        if not 1 <= channels <= MAX_CHANNELS:
+            raise ValueError(f"Unsupported channel count {channels}")
+        self.sample_rate = sample_rate
+        self.sample_format = sample_format
+        self.channels = channels
+
+    @classmethod
+    def from_message(cls, message: dict) -> "AudioFormat":
+        try:
+            return cls(
+                sample_rate=int(message.get("sample_rate", TARGET_SAMPLE_RATE)),
+                sample_format=str(message.get("sample_format", "int16")),
+                channels=int(message.get("channels", 1)),
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Invalid audio config: {e}")
+
+    @property
+    def dtype(self) -> np.dtype:
+        return SAMPLE_FORMATS[self.sample_format]
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.dtype.itemsize * self.channels
+
+    @property
+    def is_native(self) -> bool:
+        """True when audio can go to the recognizer as-is."""
+        return self.sample_rate == TARGET_SAMPLE_RATE and self.sample_format == "int16" and self.channels == 1
+
+    def to_dict(self) -> dict:
+        return {"sample_rate": self.sample_rate, "sample_format": self.sample_format, "channels": self.channels}
+
+
+def lowpass_taps(source_rate: int, target_rate: int) -> np.ndarray:
+    """Kaiser-windowed sinc FIR that removes everything above target_rate / 2 before decimation."""
+    nyquist = target_rate / 2
+    passband, stopband = ANTIALIAS_PASSBAND * nyquist, nyquist
+    width = (stopband - passband) / source_rate
+    beta = 0.1102 * (ANTIALIAS_ATTENUATION_DB - 8.7)
+    count = math.ceil((ANTIALIAS_ATTENUATION_DB - 8) / (2.285 * 2 * math.pi * width)) | 1  # Odd, so the delay is whole
+    cutoff = (passband + stopband) / 2 / source_rate
+    n = np.arange(count) - (count - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(count, beta)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+class AudioConverter:
+    """Stateful converter for one audio stream.
+
+    Buffers may split frames, and filter history and resampling phase carry over,
+    so any split of a stream converts exactly like the stream in one piece.
+    """
+
+    def __init__(self, fmt: AudioFormat, target_rate: int = TARGET_SAMPLE_RATE):
+        self.format = fmt
+        self.target_rate = target_rate
+        self.step = fmt.sample_rate / target_rate  # Input samples per output sample
+        self._taps = lowpass_taps(fmt.sample_rate, target_rate) if fmt.sample_rate > target_rate else None
+        # Last len(taps) - 1 input samples of the previous buffer
+        self._history = np.zeros(len(self._taps) - 1, dtype=np.float32) if self._taps is not None else None
+        self._remainder = b""  # Bytes of an incomplete trailing frame
+        self._tail: Optional[np.ndarray] = None  # Last input sample of the previous buffer
+        self._pos = 0.0  # Next output position, in input samples relative to _tail
+
+    def convert(self, data) -> bytes:
+        if self.format.is_native and not self._remainder and len(data) % 2 == 0:
+            return data if isinstance(data, bytes) else bytes(data)
+
+        if self._remainder:
+            data = self._remainder + bytes(data)
+        usable = len(data) - len(data) % self.format.frame_bytes
+        self._remainder = bytes(data[usable:])
+        if not usable:
+            return b""
+
+        # Zero-copy view of the client buffer as (frames, channels)
+        frames = np.frombuffer(data, dtype=self.format.dtype, count=usable // self.format.dtype.itemsize)
+        frames = frames.reshape(-1, self.format.channels)
+
+        if self.format.channels == 1:
+            mono = frames[:, 0].astype(np.float32)
+        else:
+            mono = frames.mean(axis=1, dtype=np.float32)
+        if self.format.sample_format == "float32":
+            mono *= 32767.0
+
+        if self._taps is not None:
+            mono = self._lowpass(mono)
+        if self.format.sample_rate != self.target_rate:
+            mono = self._resample(mono)
+
+        np.clip(mono, -32768, 32767, out=mono)
+        return np.rint(mono).astype("<i2").tobytes()
+
+    def _lowpass(self, samples: np.ndarray) -> np.ndarray:
+        # Filtering over the previous buffer's tail gives one output per input sample,
+        # delayed by (len(taps) - 1) / 2 samples (about 1.5 ms at 48 kHz)
+        padded = np.concatenate((self._history, samples))
+        self._history = padded[len(samples):]
+        return np.convolve(padded, self._taps, mode="valid")
+
+    def _resample(self, samples: np.ndarray) -> np.ndarray:
+        # Prepend the previous buffer's last sample so interpolation is continuous across buffers
+        if self._tail is not None:
+            samples = np.concatenate((self._tail, samples))
+        last = len(samples) - 1
+        if last < self._pos:
+            # Not enough input for another output sample yet
+            self._tail = samples[-1:]
+            self._pos -= len(samples) - 1
+            return np.empty(0, dtype=np.float32)
+
+        count = int((last - self._pos) // self.step) + 1
+        positions = self._pos + self.step * np.arange(count, dtype=np.float64)
+        index = positions.astype(np.int64)
+        frac = (positions - index).astype(np.float32)
+        upper = np.minimum(index + 1, last)
+        out = samples[index] * (1.0 - frac) + samples[upper] * frac
+
+        self._pos = positions[-1] + self.step - last
+        self._tail = samples[-1:]
+        return out
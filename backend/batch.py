@@ -0,0 +1,313 @@
+"""Offline batch transcription and analysis over recorded audio.
+
+Streams archived WAV/PCM recordings through TranscriptionService and
+process_data across a process pool, faster than real time, and writes one
+JSON Lines record per file.
+
+    python batch.py recordings/ -o results.jsonl -j 8
+    python batch.py meeting.wav --no-analyze
+"""
+import argparse
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from audio import AudioFormat
+from config import get_settings
+
+AUDIO_EXTENSIONS = {".wav", ".pcm", ".raw"}
+
+logger = logging.getLogger(__name__)
+
+# Per-worker state, set once by _init_worker
+_worker_model = None
+_worker_analyze = True
+
+
+class AudioFormatError(ValueError):
+    pass
+
+
+# WAVE format tags
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _wav_format(buf, body: int) -> AudioFormat:
+    if body + 16 > len(buf):
+        raise AudioFormatError("truncated fmt chunk")
+    audio_format, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", buf, body)
+    if audio_format == WAVE_FORMAT_EXTENSIBLE:
+        if body + 26 > len(buf):
+            raise AudioFormatError("truncated fmt chunk")
+        # The real format tag is the first two bytes of the SubFormat GUID
+        (audio_format,) = struct.unpack_from("<H", buf, body + 24)
+    if audio_format == WAVE_FORMAT_PCM and bits == 16:
+        sample_format = "int16"
+    elif audio_format == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        sample_format = "float32"
+    else:
+        raise AudioFormatError(f"expected 16-bit PCM or 32-bit float, got {bits}-bit (format {audio_format})")
+    try:
+        return AudioFormat(sample_rate=sample_rate, sample_format=sample_format, channels=channels)
+    except ValueError as e:
+        raise AudioFormatError(str(e))
+
+
+def _find_wav_data(buf) -> Tuple[memoryview, AudioFormat]:
+    """Walk the RIFF chunks of a mapped WAV file and return a view of its samples and their format."""
+    if len(buf) < 12 or buf[0:4] != b"RIFF" or buf[8:12] != b"WAVE":
+        raise AudioFormatError("not a RIFF/WAVE file")
+
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(buf):
+        chunk_id = buf[offset:offset + 4]
+        (chunk_size,) = struct.unpack_from("<I", buf, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt = _wav_format(buf, body)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError("data chunk before fmt chunk")
+            end = min(body + chunk_size, len(buf))
+            return memoryview(buf)[body:end], fmt
+        # Chunks are word aligned
+        offset = body + chunk_size + (chunk_size & 1)
+
+    raise AudioFormatError("no data chunk found")
+
+
+@contextmanager
+def open_pcm(path: str) -> Iterator[Tuple[memoryview, AudioFormat]]:
+    """Memory-map an audio file and yield a zero-copy view of its samples along with their format.
+
+    .wav files are parsed for their data chunk (16-bit PCM or 32-bit float, any
+    rate and channel count); .pcm/.raw files are taken to be headerless 16 kHz
+    mono int16.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses empty files; an empty WAV has no header at all
+            if path.lower().endswith(".wav"):
+                raise AudioFormatError("not a RIFF/WAVE file")
+            yield memoryview(b""), AudioFormat()
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if path.lower().endswith(".wav"):
+                view, fmt = _find_wav_data(mm)
+            else:
+                view, fmt = memoryview(mm), AudioFormat()
+            try:
+                yield view, fmt
+            finally:
+                # Views must be released before the map can be closed
+                view.release()
+        finally:
+            mm.close()
+
+
+def iter_chunks(view: memoryview, chunk_bytes: int) -> Iterator[memoryview]:
+    for start in range(0, len(view), chunk_bytes):
+        yield view[start:start + chunk_bytes]
+
+
+class AudioClock:
+    """Clock that reports seconds of audio consumed, so WPS/WPM reflect speech time."""
+
+    def __init__(self, fmt: AudioFormat):
+        self.format = fmt
+        self.frames = 0
+
+    def advance(self, nbytes: int):
+        self.frames += nbytes // self.format.frame_bytes
+
+    def __call__(self) -> float:
+        return self.frames / self.format.sample_rate
+
+
+async def _skip_analysis(data, emit=None):
+    return {"emotion": "speaking"}
+
+
+def _init_worker(model_path: str, analyze: bool):
+    global _worker_model, _worker_analyze
+    from vosk import Model, SetLogLevel
+
+    SetLogLevel(-1)
+    _worker_model = Model(model_path)
+    _worker_analyze = analyze
+
+    if analyze:
+        import Main
+
+        Main.prompt_template = Main.load_prompt_template()
+
+
+async def _run_file(path: str, chunk_ms: int) -> Dict[str, Any]:
+    from services import TranscriptionService
+
+    identity = os.path.splitext(os.path.basename(path))[0]
+    if _worker_analyze:
+        import Main
+
+        # process_data looks profiles up by name, and a worker's profiles outlive each file;
+        # start from a fresh one so same-named recordings don't share state
+        Main.profiles_by_name.pop(identity, None)
+        profile = Main.get_or_create_profile(identity)
+        process_data = Main.process_data
+    else:
+        from Profiles import Profile
+
+        profile = Profile(name=identity, profession="Participant", memory={})
+        process_data = _skip_analysis
+
+    utterances: List[Dict[str, Any]] = []
+    errors: List[str] = []
+
+    def collect(result):
+        if not result:
+            return
+        if result["type"] == "final":
+            utterances.append({
+                "transcript": result["transcript"],
+                "emotion": result["current_emotion"],
+                "timestamp": round(result["timestamp"], 3),
+                "metrics": result["metrics"],
+            })
+        elif result["type"] == "error":
+            errors.append(result["message"])
+
+    started = time.perf_counter()
+    with open_pcm(path) as (view, fmt):
+        clock = AudioClock(fmt)
+        service = TranscriptionService(_worker_model, get_settings().vosk_sample_rate, process_data, profile, clock=clock)
+        # Recordings in other formats go through the same converter as live sessions
+        service.set_audio_format(fmt)
+        chunk_bytes = fmt.sample_rate * chunk_ms // 1000 * fmt.frame_bytes
+        for chunk in iter_chunks(view, chunk_bytes):
+            clock.advance(len(chunk))
+            # Vosk's cffi binding only accepts bytes, so each chunk is copied at
+            # the recognizer boundary; the file itself is never read into memory.
+            collect(await service.process_audio(chunk.tobytes()))
+            chunk.release()
+    collect(await service.finish())
+    elapsed = time.perf_counter() - started
+    if _worker_analyze and Main.llm_router:
+        # Release pooled LLM connections while this file's event loop is still running
+        await Main.llm_router.close()
+
+    duration = clock()
+    emotions: Dict[str, int] = {}
+    for utterance in utterances:
+        emotions[utterance["emotion"]] = emotions.get(utterance["emotion"], 0) + 1
+
+    return {
+        "file": path,
+        "identity": identity,
+        "duration_s": round(duration, 3),
+        "elapsed_s": round(elapsed, 3),
+        "realtime_factor": round(duration / elapsed, 2) if elapsed > 0 else None,
+        "transcript": " ".join(u["transcript"] for u in utterances),
+        "utterances": utterances,
+        "metrics": {
+            "wpm": service.metrics.get_wpm(),
+            "filler_words": service.metrics.filler_count,
+            "clarity_score": service.metrics.get_clarity_score(),
+            "word_count": service.metrics.word_count,
+        },
+        "emotions": emotions,
+        "errors": errors,
+    }
+
+
+def transcribe_file(path: str, chunk_ms: int) -> Dict[str, Any]:
+    """Worker entry point: transcribe and analyze one recording."""
+    try:
+        return asyncio.run(_run_file(path, chunk_ms))
+    except Exception as e:
+        return {"file": path, "error": f"{type(e).__name__}: {e}"}
+
+
+def collect_files(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def run_batch(files: List[str], output: str, workers: int, model_path: str,
+              analyze: bool = True, chunk_ms: int = 500) -> int:
+    """Process files across a worker pool, writing results as they complete.
+
+    Returns the number of files that failed.
+    """
+    failures = 0
+    out = sys.stdout if output == "-" else open(output, "w")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, analyze)) as pool:
+            futures = {pool.submit(transcribe_file, path, chunk_ms): path for path in files}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # A worker that failed to start (e.g. the model or Main won't load) breaks the
+                    # whole pool; report it against each file rather than aborting the run
+                    record = {"file": futures[future], "error": f"{type(e).__name__}: {e}"}
+                if "error" in record:
+                    failures += 1
+                    logger.error(f"{record['file']}: {record['error']}")
+                else:
+                    logger.info(
+                        f"{record['file']}: {record['duration_s']}s of audio in "
+                        f"{record['elapsed_s']}s ({record['realtime_factor']}x real time)"
+                    )
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return failures
+
+
+def main(argv=None):
+    # Loads .env and configures logging for the parent process
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Batch transcription and analysis of recorded audio")
+    parser.add_argument("paths", nargs="+", help="WAV/PCM files or directories containing them")
+    parser.add_argument("-o", "--output", default="-", help="JSON Lines output file (default: stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes")
+    parser.add_argument("--model", default=settings.vosk_model_path, help="Path to the Vosk model")
+    parser.add_argument("--chunk-ms", type=int, default=500, help="Audio fed to the recognizer per step")
+    parser.add_argument("--no-analyze", action="store_true",
+                        help="Transcribe only; skip the LLM profile and emotion analysis")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths)
+    if not files:
+        parser.error("no audio files found")
+
+    failures = run_batch(files, args.output, args.workers, args.model,
+                         analyze=not args.no_analyze, chunk_ms=args.chunk_ms)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""End-to-end load test for the transcription WebSocket.
+
+Opens N /ws/transcribe/{identity} connections that stream recorded audio at
+real-time pace, measures partial and final reaction latency per frame, and
+samples the server's CPU and memory. Run from the backend directory:
+
+    # Start the mock LLM and Main.py, then drive 25 speakers for a minute
+    python -m benchmark.loadtest --audio sample.wav -n 25 --duration 60 --spawn
+
+    # Against an already running server, saving and checking against a baseline
+    python -m benchmark.loadtest --audio sample.wav -n 25 --server-pid 1234 \\
+        --save-report after.json --baseline before.json
+
+    # Send a 48 kHz float32 recording as-is, as binary frames, and let the server convert it
+    python -m benchmark.loadtest --audio browser-48k.wav -n 25 --native --binary --spawn
+
+Latency is measured from sending a frame to receiving the result the server
+produced for it (results echo the frame's "seq"). "reaction" is the first
+useful result for a final utterance: an early emotion/profile push when the
+server sends them, otherwise the final itself.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+
+from audio import AudioConverter, AudioFormat
+from batch import open_pcm
+from benchmark import report as bench_report
+
+DEFAULT_URL = "ws://127.0.0.1:8001"
+MOCK_LLM_PORT = 8100
+
+logger = logging.getLogger(__name__)
+
+
+class Collector:
+    """Latency samples and counters shared by all simulated speakers."""
+
+    def __init__(self):
+        self.partial: List[float] = []
+        self.final: List[float] = []
+        # First useful result per frame: an early emotion/profile push or the final itself
+        self.reaction: List[float] = []
+        self.counters: Dict[str, int] = {
+            "connected": 0,
+            "connect_failed": 0,
+            "closed_by_server": 0,
+            "refused": 0,
+            "frames_sent": 0,
+            "errors": 0,
+            "late_frames": 0,
+        }
+
+    def count(self, key: str, n: int = 1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+
+class ResourceSampler:
+    """Periodically samples CPU time and RSS of a process from /proc (Linux)."""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[Dict[str, float]] = []
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self._started = time.monotonic()
+
+    def sample(self):
+        with open(f"/proc/{self.pid}/stat", "r") as f:
+            # Fields after the parenthesised command name; utime/stime are 14th/15th overall
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_s = (int(fields[11]) + int(fields[12])) / self._ticks
+
+        rss_mb = 0.0
+        with open(f"/proc/{self.pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_mb = int(line.split()[1]) / 1024
+                    break
+
+        self.samples.append({"elapsed_s": time.monotonic() - self._started, "cpu_s": cpu_s, "rss_mb": rss_mb})
+
+    async def run(self):
+        while True:
+            try:
+                self.sample()
+            except (FileNotFoundError, ProcessLookupError):
+                logger.warning(f"Server process {self.pid} is gone; stopping resource sampling")
+                return
+            await asyncio.sleep(self.interval)
+
+
+def load_audio(path: str, native: bool = False) -> Tuple[bytes, AudioFormat]:
+    """Read a recording, converted up front to 16 kHz mono int16 unless `native` keeps its own format."""
+    with open_pcm(path) as (view, fmt):
+        if native or fmt.is_native:
+            pcm = view.tobytes()
+        else:
+            pcm = AudioConverter(fmt).convert(view)
+            fmt = AudioFormat()
+    if not pcm:
+        raise SystemExit(f"{path} contains no audio")
+    return pcm, fmt
+
+
+async def run_speaker(url: str, identity: str, room: str, pcm: bytes, fmt: AudioFormat, chunk_bytes: int,
+                      duration: float, binary: bool, collector: Collector):
+    chunk_s = chunk_bytes / fmt.frame_bytes / fmt.sample_rate
+    sent_at: Dict[int, float] = {}
+    reacted = set()
+
+    try:
+        ws = await websockets.connect(f"{url}/ws/transcribe/{identity}?room={room}", max_size=None)
+    except Exception as e:
+        logger.error(f"{identity}: connect failed: {e}")
+        collector.count("connect_failed")
+        return
+    collector.count("connected")
+
+    async def receive():
+        try:
+            async for raw in ws:
+                await handle(json.loads(raw))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def handle(message):
+        kind = message.get("type")
+        if kind == "ping":
+            await ws.send(json.dumps({"type": "pong"}))
+        elif kind in ("partial", "final", "emotion", "profile") and message.get("seq") in sent_at:
+            seq = message["seq"]
+            latency = time.perf_counter() - sent_at[seq]
+            if kind in ("final", "emotion", "profile") and seq not in reacted:
+                reacted.add(seq)
+                collector.reaction.append(latency)
+            if kind in ("partial", "final"):
+                del sent_at[seq]
+                reacted.discard(seq)
+                (collector.partial if kind == "partial" else collector.final).append(latency)
+        elif kind == "error":
+            collector.count("errors")
+
+    receiver = asyncio.create_task(receive())
+    try:
+        if not fmt.is_native:
+            await ws.send(json.dumps({"type": "config", **fmt.to_dict()}))
+        start = time.perf_counter()
+        seq = 0
+        offset = 0
+        while time.perf_counter() - start < duration and not receiver.done():
+            # Schedule against the start time so pacing does not drift
+            due = start + seq * chunk_s
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -chunk_s:
+                collector.count("late_frames")
+
+            chunk = pcm[offset:offset + chunk_bytes]
+            offset += chunk_bytes
+            if offset >= len(pcm):
+                offset = 0  # Loop the recording for long runs
+
+            sent_at[seq] = time.perf_counter()
+            if binary:
+                # Binary frames carry no seq, so only throughput and counters are measured
+                await ws.send(chunk)
+            else:
+                await ws.send(json.dumps({"bytes": list(chunk), "seq": seq}))
+            collector.count("frames_sent")
+            seq += 1
+
+        if receiver.done():
+            # 1013 (try again later) is the server's admission control refusing the session
+            collector.count("refused" if ws.close_code == 1013 else "closed_by_server")
+        else:
+            # Give in-flight finals (LLM round trips) a moment to arrive
+            await asyncio.sleep(min(5.0, duration))
+    except websockets.ConnectionClosed:
+        collector.count("refused" if ws.close_code == 1013 else "closed_by_server")
+    finally:
+        receiver.cancel()
+        await ws.close()
+
+
+def wait_for_server(status_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(status_url, timeout=2) as resp:
+                if json.load(resp).get("vosk_model_loaded"):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"Server at {status_url} did not become ready within {timeout}s")
+
+
+def spawn_stack(args) -> List[subprocess.Popen]:
+    """Start the mock LLM and Main.py wired to it; returns [mock, server]."""
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmark.mock_llm", "--port", str(MOCK_LLM_PORT),
+         "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+         "--error-rate", str(args.llm_error_rate)],
+        stdout=log, stderr=subprocess.STDOUT,
+    )
+    env = dict(os.environ, ANTHROPIC_BASE_URL=f"http://127.0.0.1:{MOCK_LLM_PORT}",
+               ANTHROPIC_API_KEY=os.getenv("ANTHROPIC_API_KEY", "mock"))
+    server = subprocess.Popen([sys.executable, "Main.py"], env=env, stdout=log, stderr=subprocess.STDOUT)
+    return [mock, server]
+
+
+async def run_load(args, collector: Collector, sampler: Optional[ResourceSampler]):
+    pcm, fmt = load_audio(args.audio, native=args.native)
+    chunk_bytes = fmt.sample_rate * args.chunk_ms // 1000 * fmt.frame_bytes
+
+    sampling = asyncio.create_task(sampler.run()) if sampler else None
+    speakers = []
+    for i in range(args.connections):
+        speakers.append(asyncio.create_task(
+            run_speaker(args.url, f"{args.identity_prefix}-{i}", f"{args.identity_prefix}-room-{i % args.rooms}",
+                        pcm, fmt, chunk_bytes, args.duration, args.binary, collector)
+        ))
+        if args.ramp_s and args.connections > 1:
+            await asyncio.sleep(args.ramp_s / (args.connections - 1))
+    await asyncio.gather(*speakers)
+
+    if sampling:
+        sampling.cancel()
+        sampler.sample()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the transcription WebSocket")
+    parser.add_argument("--audio", required=True, help="WAV (16-bit PCM or float) or raw 16 kHz PCM to stream")
+    parser.add_argument("-n", "--connections", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio per connection")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio per WebSocket frame")
+    parser.add_argument("--ramp-s", type=float, default=0.0, help="Spread connection starts over this many seconds")
+    parser.add_argument("--native", action="store_true",
+                        help="Send the recording in its own format and let the server convert it")
+    parser.add_argument("--binary", action="store_true", help="Send audio as binary frames instead of JSON")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--identity-prefix", default="loadtest")
+    parser.add_argument("--rooms", type=int, default=1, help="Spread connections round-robin over this many rooms")
+    parser.add_argument("--server-pid", type=int, help="Sample CPU/RSS of this process")
+    parser.add_argument("--spawn", action="store_true", help="Start the mock LLM and Main.py for the run")
+    parser.add_argument("--server-log", help="With --spawn, write server/mock output here")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--save-report", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Fail if results regress against this saved report")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression as a fraction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    processes = []
+    try:
+        if args.spawn:
+            processes = spawn_stack(args)
+            args.server_pid = processes[1].pid
+            status_url = args.url.replace("ws://", "http://").replace("wss://", "https://") + "/status"
+            wait_for_server(status_url, timeout=120)
+
+        collector = Collector()
+        sampler = ResourceSampler(args.server_pid) if args.server_pid else None
+        asyncio.run(run_load(args, collector, sampler))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    config = {
+        "connections": args.connections,
+        "rooms": args.rooms,
+        "duration_s": args.duration,
+        "chunk_ms": args.chunk_ms,
+        "native": args.native,
+        "binary": args.binary,
+        "llm_latency_ms": args.llm_latency_ms if args.spawn else None,
+        "llm_error_rate": args.llm_error_rate if args.spawn else None,
+    }
+    report = bench_report.build_report(
+        config, collector.partial, collector.final, collector.reaction,
+        sampler.samples if sampler else [], collector.counters,
+    )
+    print(bench_report.format_report(report))
+
+    if args.save_report:
+        bench_report.save_report(report, args.save_report)
+
+    if args.baseline:
+        regressions = bench_report.compare_to_baseline(
+            report, bench_report.load_report(args.baseline), args.tolerance
+        )
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Local stand-in for the Anthropic messages API with configurable latency and errors.
+
+    python -m benchmark.mock_llm --port 8100 --latency-ms 800 --jitter-ms 300 --error-rate 0.02
+
+Point the server at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8100. Settings can
+be changed while a run is in progress (e.g. to simulate a brownout):
+
+    curl -X POST localhost:8100/mock/config -d '{"latency_ms": 12000}'
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMOTIONS = ["idle", "question", "nodding", "shaking_head", "excited", "thinking", "confused", "speaking", "slow"]
+
+# Requests at or below this max_tokens are the one-word emotion calls
+EMOTION_MAX_TOKENS = 16
+
+settings = {
+    "latency_ms": 800.0,
+    "jitter_ms": 200.0,
+    "error_rate": 0.0,
+    "error_status": 529,
+    "token_ms": 15.0,  # Delay between streamed deltas; latency_ms is then time-to-first-token
+}
+# Characters per streamed delta, roughly one token
+DELTA_CHARS = 4
+stats = {"requests": 0, "errors": 0}
+
+app = FastAPI()
+
+
+def profile_text() -> str:
+    # Same key order as the schema in prompts/base.xml
+    return json.dumps({
+        "interest": round(random.uniform(0.1, 0.9), 2),
+        "confidence": round(random.uniform(0.2, 0.8), 2),
+        "profession": "Participant",
+        "memory": {"they know main_business_value": random.choice(["Confident True", "Uncertain True"])},
+        "understanding_threshold": 0.6,
+        "filler_words": random.randint(5, 20),
+    }, indent=2)
+
+
+def message_body(model: str, text: str) -> dict:
+    return {
+        "id": f"msg_mock_{uuid.uuid4().hex[:16]}",
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": 0},
+    }
+
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    payload = await request.json()
+    stats["requests"] += 1
+
+    delay = max(0.0, settings["latency_ms"] + random.uniform(-1, 1) * settings["jitter_ms"]) / 1000
+    await asyncio.sleep(delay)
+
+    if random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=settings["error_status"],
+            content={"type": "error", "error": {"type": "overloaded_error", "message": "Mock overload"}},
+        )
+
+    if payload.get("max_tokens", 0) <= EMOTION_MAX_TOKENS:
+        text = random.choice(EMOTIONS)
+    else:
+        text = profile_text()
+    if payload.get("stream"):
+        return StreamingResponse(stream_events(payload.get("model", "mock"), text), media_type="text/event-stream")
+    return message_body(payload.get("model", "mock"), text)
+
+
+def sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_events(model: str, text: str):
+    start = message_body(model, "")
+    start["content"] = []
+    yield sse({"type": "message_start", "message": start})
+    yield sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+    for i in range(0, len(text), DELTA_CHARS):
+        if i:
+            await asyncio.sleep(settings["token_ms"] / 1000)
+        yield sse({"type": "content_block_delta", "index": 0,
+                   "delta": {"type": "text_delta", "text": text[i:i + DELTA_CHARS]}})
+    yield sse({"type": "content_block_stop", "index": 0})
+    yield sse({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+               "usage": {"output_tokens": 0}})
+    yield sse({"type": "message_stop"})
+
+
+@app.get("/mock/config")
+async def get_config():
+    return {"settings": settings, "stats": stats, "time": time.time()}
+
+
+@app.post("/mock/config")
+async def update_config(request: Request):
+    updates = await request.json()
+    for key, value in updates.items():
+        if key in settings:
+            settings[key] = type(settings[key])(value)
+    return {"settings": settings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Anthropic messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"])
+    parser.add_argument("--error-status", type=int, default=settings["error_status"])
+    parser.add_argument("--token-ms", type=float, default=settings["token_ms"],
+                        help="Delay between deltas of streamed responses")
+    args = parser.parse_args(argv)
+
+    settings.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        token_ms=args.token_ms,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
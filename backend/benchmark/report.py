@@ -0,0 +1,118 @@
+"""Latency/resource summaries for load-test runs, and regression checks against a baseline."""
+import json
+import math
+from typing import Dict, List, Optional
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(values: List[float]) -> Dict[str, Optional[float]]:
+    summary = {"count": len(values)}
+    for pct in PERCENTILES:
+        value = percentile(values, pct)
+        summary[f"p{pct}_ms"] = round(value * 1000, 1) if value is not None else None
+    summary["max_ms"] = round(max(values) * 1000, 1) if values else None
+    return summary
+
+
+def summarize_resources(samples: List[Dict[str, float]]) -> Dict[str, Optional[float]]:
+    """Summarize (elapsed_s, cpu_s, rss_mb) samples taken from the server process."""
+    if len(samples) < 2:
+        return {"cpu_avg_pct": None, "cpu_max_pct": None, "rss_start_mb": None,
+                "rss_end_mb": None, "rss_growth_mb": None}
+
+    cpu = []
+    for prev, cur in zip(samples, samples[1:]):
+        wall = cur["elapsed_s"] - prev["elapsed_s"]
+        if wall > 0:
+            cpu.append((cur["cpu_s"] - prev["cpu_s"]) / wall * 100)
+
+    first, last = samples[0], samples[-1]
+    wall = last["elapsed_s"] - first["elapsed_s"]
+    return {
+        "cpu_avg_pct": round((last["cpu_s"] - first["cpu_s"]) / wall * 100, 1) if wall > 0 else None,
+        "cpu_max_pct": round(max(cpu), 1) if cpu else None,
+        "rss_start_mb": round(first["rss_mb"], 1),
+        "rss_end_mb": round(last["rss_mb"], 1),
+        "rss_growth_mb": round(last["rss_mb"] - first["rss_mb"], 1),
+    }
+
+
+LATENCY_KINDS = ("partial", "final", "reaction")
+
+
+def build_report(config: Dict, partial: List[float], final: List[float], reaction: List[float],
+                 resources: List[Dict[str, float]], counters: Dict[str, int]) -> Dict:
+    return {
+        "config": config,
+        "partial": summarize_latencies(partial),
+        "final": summarize_latencies(final),
+        "reaction": summarize_latencies(reaction),
+        "resources": summarize_resources(resources),
+        "counters": counters,
+    }
+
+
+def format_report(report: Dict) -> str:
+    lines = []
+    config = report["config"]
+    lines.append(f"Connections: {config['connections']}  duration: {config['duration_s']}s  "
+                 f"chunk: {config['chunk_ms']}ms")
+    lines.append(f"{'':10}{'count':>8}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES) + f"{'max':>10}")
+    for kind in LATENCY_KINDS:
+        row = report.get(kind)
+        if row is None:
+            continue
+        cells = "".join(
+            f"{row[f'p{p}_ms']:>8.1f}ms" if row[f"p{p}_ms"] is not None else f"{'-':>10}"
+            for p in PERCENTILES
+        )
+        max_cell = f"{row['max_ms']:>8.1f}ms" if row["max_ms"] is not None else f"{'-':>10}"
+        lines.append(f"{kind:10}{row['count']:>8}{cells}{max_cell}")
+
+    res = report["resources"]
+    if res["cpu_avg_pct"] is not None:
+        lines.append(f"CPU: avg {res['cpu_avg_pct']}%  max {res['cpu_max_pct']}%")
+        lines.append(f"RSS: {res['rss_start_mb']} MB -> {res['rss_end_mb']} MB "
+                     f"(growth {res['rss_growth_mb']} MB)")
+    else:
+        lines.append("CPU/RSS: not sampled (pass --server-pid or --spawn)")
+
+    lines.append("Counters: " + ", ".join(f"{k}={v}" for k, v in sorted(report["counters"].items())))
+    return "\n".join(lines)
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of each metric that regressed by more than `tolerance` (a fraction)."""
+    regressions = []
+    checks = [(kind, f"p{p}_ms") for kind in LATENCY_KINDS for p in PERCENTILES]
+    checks += [("resources", "cpu_avg_pct"), ("resources", "rss_growth_mb")]
+    for section, key in checks:
+        current = report.get(section, {}).get(key)
+        previous = baseline.get(section, {}).get(key)
+        if current is None or previous is None:
+            continue
+        # Small absolute floor so near-zero baselines don't flag noise
+        limit = previous * (1 + tolerance) + 1.0
+        if current > limit:
+            regressions.append(f"{section}.{key}: {previous} -> {current}")
+    return regressions
+
+
+def load_report(path: str) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_report(report: Dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
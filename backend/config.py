@@ -0,0 +1,68 @@
+import logging
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+def _list(value: str):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class Settings:
+    """Process-wide configuration, read once from the environment (and .env)."""
+
+    def __init__(self):
+        self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
+        # Every LLM call goes through llm_router to this base URL, so pointing it at a
+        # stand-in such as benchmark/mock_llm.py redirects all of them
+        self.anthropic_base_url = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+        self.anthropic_api_url = f"{self.anthropic_base_url}/v1/messages"
+        self.vosk_model_path = os.getenv("VOSK_MODEL_PATH", "vosk-model")
+        self.vosk_sample_rate = 16000
+        self.prompt_path = os.getenv("PROMPT_PATH", "prompts/base.xml")
+        self.host = os.getenv("HOST", "127.0.0.1")
+        self.port = int(os.getenv("PORT", "8001"))
+        # LLM routing: model tiers, per-task route order, hedging and circuit breaking
+        self.llm_primary_model = os.getenv("LLM_PRIMARY_MODEL", "claude-3-7-sonnet-20250219")
+        self.llm_fast_model = os.getenv("LLM_FAST_MODEL", "claude-3-5-haiku-20241022")
+        self.llm_profile_route = _list(os.getenv("LLM_PROFILE_ROUTE", "primary,fast"))
+        self.llm_emotion_route = _list(os.getenv("LLM_EMOTION_ROUTE", "fast,primary"))
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT", "10"))
+        self.llm_hedge_min = float(os.getenv("LLM_HEDGE_MIN_S", "0.5"))
+        self.llm_hedge_max = float(os.getenv("LLM_HEDGE_MAX_S", "5"))
+        self.llm_breaker_error_rate = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+        self.llm_breaker_latency = float(os.getenv("LLM_BREAKER_LATENCY_S", "8"))
+        self.llm_breaker_cooldown = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "15"))
+        # Stream the profile response and push interest/confidence as they arrive
+        self.llm_streaming = os.getenv("LLM_STREAMING", "").lower() in ("1", "true", "yes")
+        # Admission control: global and per-room limits, and the recognizer backlog
+        # fractions at which partials and then LLM analysis are shed
+        self.max_sessions = int(os.getenv("MAX_SESSIONS", "200"))
+        self.max_sessions_per_room = int(os.getenv("MAX_SESSIONS_PER_ROOM", "50"))
+        self.max_queued_chunks = int(os.getenv("MAX_QUEUED_CHUNKS", "64"))
+        self.max_queued_chunks_per_room = int(os.getenv("MAX_QUEUED_CHUNKS_PER_ROOM", "16"))
+        self.max_llm_calls = int(os.getenv("MAX_LLM_CALLS", "32"))
+        self.max_llm_calls_per_room = int(os.getenv("MAX_LLM_CALLS_PER_ROOM", "8"))
+        self.shed_partials_at = float(os.getenv("SHED_PARTIALS_AT", "0.5"))
+        self.shed_llm_at = float(os.getenv("SHED_LLM_AT", "0.8"))
+        # New sessions are refused below full capacity so admitted ones keep headroom
+        self.refuse_sessions_at = float(os.getenv("REFUSE_SESSIONS_AT", "0.9"))
+        # Time constant of the smoothed backlog behind the soft shedding decisions
+        self.pressure_smoothing = float(os.getenv("PRESSURE_SMOOTHING_S", "2"))
+        # One heartbeat sweep for all WebSocket sessions
+        self.heartbeat_interval = float(os.getenv("HEARTBEAT_INTERVAL_S", "10"))
+        self.idle_timeout = float(os.getenv("IDLE_TIMEOUT_S", "30"))
+        self.startup_profile = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+        # Room agents: transcribe LiveKit rooms server-side instead of via browser uploads
+        self.livekit_url = os.getenv("LIVEKIT_URL")
+        self.agent_rooms = _list(os.getenv("AGENT_ROOMS", ""))
+        self.agent_identity = os.getenv("AGENT_IDENTITY", "buddy-agent")
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Load .env, configure logging and return the settings. Only the first call does any work."""
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    return Settings()
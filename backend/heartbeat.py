@@ -0,0 +1,90 @@
+"""One heartbeat and idle-timeout sweep shared by all WebSocket sessions.
+
+Instead of a ping task per connection and a timer per received frame, sessions
+register here and bump a last-seen timestamp on each frame. A single periodic
+sweep closes every session that has gone idle and pings the rest with a
+pre-serialized frame, both in bulk.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+PING_FRAME = json.dumps({"type": "ping"})
+
+# Normal closure; the client may reconnect at will
+CLOSE_IDLE = 1000
+
+
+class HeartbeatSession:
+    __slots__ = ("websocket", "name", "last_seen")
+
+    def __init__(self, websocket, name: str):
+        self.websocket = websocket
+        self.name = name
+        self.last_seen = time.monotonic()
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+
+class HeartbeatManager:
+    def __init__(self, ping_interval: float = 10.0, idle_timeout: float = 30.0):
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.sessions: Dict[int, HeartbeatSession] = {}
+        self.idle_closed = 0
+        self._task = None
+
+    def register(self, websocket, name: str) -> HeartbeatSession:
+        session = HeartbeatSession(websocket, name)
+        self.sessions[id(session)] = session
+        return session
+
+    def unregister(self, session: HeartbeatSession):
+        self.sessions.pop(id(session), None)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Heartbeat sweep failed: {e}")
+
+    async def sweep(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        idle, alive = [], []
+        for session in self.sessions.values():
+            (idle if session.last_seen < cutoff else alive).append(session)
+
+        for session in idle:
+            # Unregister now so a slow close isn't picked up again by the next sweep
+            self.unregister(session)
+            logger.info(f"Closing idle connection for {session.name}")
+        self.idle_closed += len(idle)
+
+        await asyncio.gather(
+            *(session.websocket.close(code=CLOSE_IDLE, reason="Idle timeout") for session in idle),
+            *(session.websocket.send_text(PING_FRAME) for session in alive),
+            return_exceptions=True,
+        )
+
+    def status(self):
+        return {"sessions": len(self.sessions), "idle_closed": self.idle_closed}
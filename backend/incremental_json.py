@@ -0,0 +1,89 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class IncrementalJSONParser:
+    """Parses a streamed JSON object, reporting each top-level member as soon as its value is complete.
+
+    Text is fed in arbitrary fragments (e.g. LLM token deltas). Anything before the
+    first opening brace, such as a stray code fence or prose that itself contains
+    brackets or quotes, is ignored. Each character is
+    scanned once, so the total cost is linear in the response length.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._object_start: Optional[int] = None
+        self._object_end: Optional[int] = None
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add a fragment and return the (key, value) members completed by it."""
+        if self.done:
+            return []
+        self.buffer += text
+        members = []
+        buf = self.buffer
+
+        while self._pos < len(buf):
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+
+            if self._depth == 0:
+                # Still in the preamble; only the object's opening brace matters
+                if ch == "{":
+                    self._object_start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None and self._key is None:
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None and self._value_start is None:
+                    self._key_start = i
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_member(buf, i, members)
+                    self._object_end = i + 1
+                    self.done = True
+                    break
+            elif ch == ":" and self._depth == 1 and self._key is not None and self._value_start is None:
+                self._value_start = i + 1
+            elif ch == "," and self._depth == 1:
+                self._finish_member(buf, i, members)
+
+        return members
+
+    def _finish_member(self, buf: str, end: int, members: List[Tuple[str, Any]]):
+        if self._key is not None and self._value_start is not None:
+            members.append((self._key, json.loads(buf[self._value_start:end])))
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+
+    def result(self) -> Dict[str, Any]:
+        """The complete object; raises json.JSONDecodeError if the stream ended early."""
+        if not self.done:
+            raise json.JSONDecodeError("Incomplete JSON object", self.buffer, len(self.buffer))
+        return json.loads(self.buffer[self._object_start:self._object_end])
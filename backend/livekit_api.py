@@ -6,7 +6,6 @@ from typing import Optional
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from livekit.api import AccessToken, VideoGrants
 
 
 class ConnectionDetails(BaseModel):
@@ -41,14 +40,17 @@ def get_livekit_url(url: str, region: Optional[str] = None) -> str:
         return url
 
 
-def create_participant_token(identity: str, name: str, metadata: str, room_name: str) -> str:
-    """Create a participant token for LiveKit."""
+def create_participant_token(identity: str, name: str, metadata: str, room_name: str, agent: bool = False) -> str:
+    """Create a participant token for LiveKit. Agent tokens join hidden from the other participants."""
     api_key = os.getenv('LIVEKIT_API_KEY')
     api_secret = os.getenv('LIVEKIT_API_SECRET')
 
     if not api_key or not api_secret:
         raise HTTPException(status_code=500, detail="LiveKit API credentials not configured")
 
+    # livekit.api is heavy; import it when a token is first requested
+    from livekit.api import AccessToken, VideoGrants
+
     try:
         token = AccessToken(api_key, api_secret)
         token.with_identity(identity).with_name(name).with_metadata(metadata)
@@ -58,6 +60,8 @@ def create_participant_token(identity: str, name: str, metadata: str, room_name:
             can_publish=True,
             can_publish_data=True,
             can_subscribe=True,
+            hidden=agent,
+            agent=agent,
         ))
         token.with_ttl(timedelta(minutes=5))
         return token.to_jwt()
@@ -129,6 +133,7 @@ def setup_livekit_routes(app: FastAPI):
                 )
 
             # Create token
+            from livekit.api import AccessToken, VideoGrants
             token = AccessToken(api_key, api_secret)
             token.with_identity(username)
             token.with_grants(VideoGrants(
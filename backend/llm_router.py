@@ -0,0 +1,434 @@
+"""Latency-aware routing of LLM calls across model tiers.
+
+Each task ("profile", "emotion") has an ordered list of routes, one per model
+tier. A request goes to the first healthy route; if it has not answered by
+that route's p95-based hedge deadline, the next route is raced against it and
+the first good answer wins. Every route keeps its own latency history and
+circuit breaker, and when no route is healthy complete() returns None so the
+caller can fall back to local heuristics instead of stalling on a timeout.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+def _percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """Rolling window of call latencies, in seconds.
+
+    Successful calls contribute their latency; calls cancelled because a hedge
+    overtook them contribute the time they had run, a lower bound on theirs.
+    """
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        return _percentile(self.samples, pct)
+
+
+class CircuitBreaker:
+    """Opens when a route's recent error rate, p95 latency or overtaken rate is too high.
+
+    A call is overtaken when a hedge started after it answers first; a route that
+    is overtaken most of the time is consistently slower than its fallback, even
+    if each cancelled call stopped short of max_latency.
+
+    After `cooldown` seconds one probe request is let through (half-open); a fast
+    success closes the breaker again, anything else re-opens it.
+    """
+
+    def __init__(self, window: int = 20, min_samples: int = 5, max_error_rate: float = 0.5,
+                 max_latency: float = 8.0, cooldown: float = 15.0, max_overtaken_rate: float = 0.5):
+        self.outcomes = deque(maxlen=window)  # (ok, latency, overtaken)
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.max_overtaken_rate = max_overtaken_rate
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record(self, ok: bool, latency: float, overtaken: bool = False):
+        if self.state == "half_open":
+            self._probing = False
+            if ok and not overtaken and latency <= self.max_latency:
+                self.state = "closed"
+                self.outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self.outcomes.append((ok, latency, overtaken))
+        if self.state == "closed" and len(self.outcomes) >= self.min_samples:
+            count = len(self.outcomes)
+            error_rate = sum(1 for ok, _, _ in self.outcomes if not ok) / count
+            overtaken_rate = sum(1 for _, _, overtaken in self.outcomes if overtaken) / count
+            p95 = _percentile([latency for _, latency, _ in self.outcomes], 95)
+            if (error_rate > self.max_error_rate or p95 > self.max_latency
+                    or overtaken_rate > self.max_overtaken_rate):
+                logger.warning(f"Circuit opened: error rate {error_rate:.0%}, p95 {p95:.2f}s, "
+                               f"overtaken {overtaken_rate:.0%}")
+                self._open()
+
+    def record_overtaken(self, elapsed: float):
+        """A call was cancelled after `elapsed` seconds because a later hedge answered first.
+
+        Its real latency is at least `elapsed`, so it counts as a (censored) slow sample.
+        """
+        self.record(True, elapsed, overtaken=True)
+
+    def abandon(self):
+        """A call was cancelled with nothing learned about it (e.g. an earlier-started route won)."""
+        self._probing = False
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+
+class Route:
+    def __init__(self, task: str, tier: str, model: str, breaker: CircuitBreaker):
+        self.task = task
+        self.tier = tier
+        self.model = model
+        self.latency = LatencyTracker()
+        self.breaker = breaker
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.overtaken = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.task}:{self.tier}"
+
+    def status(self) -> Dict:
+        p50 = self.latency.percentile(50)
+        p95 = self.latency.percentile(95)
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "errors": self.errors,
+            "wins": self.wins,
+            "overtaken": self.overtaken,
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+        }
+
+
+class LLMRouter:
+    def __init__(self, api_url: str, api_key: Optional[str], tiers: Dict[str, str],
+                 task_routes: Dict[str, List[str]], timeout: float = 10.0,
+                 hedge_min: float = 0.5, hedge_max: float = 5.0, breaker_options: Optional[Dict] = None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.hedge_min = hedge_min
+        self.hedge_max = hedge_max
+        self.routes: Dict[str, List[Route]] = {
+            task: [Route(task, tier, tiers[tier], CircuitBreaker(**(breaker_options or {}))) for tier in order]
+            for task, order in task_routes.items()
+        }
+        self.hedges = 0
+        self.fallbacks = 0
+        self._client = None
+        self._client_loop = None
+
+    @classmethod
+    def from_settings(cls, settings) -> "LLMRouter":
+        return cls(
+            api_url=settings.anthropic_api_url,
+            api_key=settings.anthropic_api_key,
+            tiers={"primary": settings.llm_primary_model, "fast": settings.llm_fast_model},
+            task_routes={"profile": settings.llm_profile_route, "emotion": settings.llm_emotion_route},
+            timeout=settings.llm_timeout,
+            hedge_min=settings.llm_hedge_min,
+            hedge_max=settings.llm_hedge_max,
+            breaker_options={
+                "max_error_rate": settings.llm_breaker_error_rate,
+                "max_latency": settings.llm_breaker_latency,
+                "cooldown": settings.llm_breaker_cooldown,
+            },
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # One pooled client for all calls instead of a new connection per request. Its
+        # connections belong to the loop that opened them, so a new loop (batch mode runs
+        # one per file) gets a fresh client; the old one died with its loop.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+            self._client_loop = loop
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            if self._client_loop is asyncio.get_running_loop():
+                await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+    def hedge_delay(self, route: Route) -> float:
+        p95 = route.latency.percentile(95)
+        if p95 is None:
+            return self.hedge_max
+        return min(self.hedge_max, max(self.hedge_min, p95))
+
+    async def complete(self, task: str, prompt: str, max_tokens: int) -> Optional[str]:
+        """Return the first successful completion across the task's routes, or None."""
+        return await self._race(task, lambda route: self._call(route, prompt, max_tokens))
+
+    async def stream(self, task: str, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """Yield text deltas from the first route to produce a token.
+
+        Hedging races time-to-first-token; once a route has started answering the
+        response is consumed from it alone. Yields nothing when no route is healthy.
+        """
+        opened = await self._race(
+            task, lambda route: self._open_stream(route, prompt, max_tokens), discard=self._close_stream
+        )
+        if opened is None:
+            return
+
+        try:
+            yield opened.first
+            async for text in opened.deltas:
+                yield text
+        except Exception as e:
+            route = opened.route
+            route.errors += 1
+            route.breaker.record(False, time.monotonic() - opened.started)
+            logger.error(f"LLM stream on {route.name} failed mid-response: {e}")
+            raise
+        finally:
+            await self._close_stream(opened)
+
+    async def _race(self, task: str, start: Callable[[Route], Awaitable[Any]],
+                    discard: Optional[Callable[[Any], Awaitable[None]]] = None) -> Any:
+        """Run start(route) on the task's routes with hedging and failover.
+
+        start returns None on failure. Returns the first non-None result, or None
+        if every healthy route failed or none was healthy.
+        """
+        routes = self.routes[task]
+        pending: Dict[asyncio.Task, Route] = {}
+        launched_at: Dict[asyncio.Task, float] = {}
+        next_index = 0
+
+        def launch() -> bool:
+            # Breakers are consulted only when a route is actually about to be used,
+            # so a half-open probe slot is never claimed by a request that won't send it
+            nonlocal next_index
+            while next_index < len(routes):
+                route = routes[next_index]
+                next_index += 1
+                if route.breaker.allow():
+                    call = asyncio.create_task(start(route))
+                    pending[call] = route
+                    launched_at[call] = time.monotonic()
+                    return True
+            return False
+
+        if not launch():
+            self.fallbacks += 1
+            logger.warning(f"No healthy LLM route for {task}; using local fallback")
+            return None
+
+        first = next(iter(pending.values()))
+        hedge_at = time.monotonic() + self.hedge_delay(first)
+        winner = None
+        winner_launched = None
+        try:
+            while pending and winner is None:
+                timeout = None
+                if next_index < len(routes):
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # First route is slower than usual: race the next healthy tier against it
+                    if launch():
+                        self.hedges += 1
+                        logger.info(f"Hedged {task} request from {first.name}")
+                    continue
+
+                for finished in done:
+                    route = pending.pop(finished)
+                    result = finished.result()
+                    if result is None:
+                        continue
+                    if winner is None:
+                        route.wins += 1
+                        winner = result
+                        winner_launched = launched_at[finished]
+                    elif discard:
+                        # Two routes answered together; release the loser
+                        await discard(result)
+
+                # Everything in flight failed; fail over right away rather than waiting
+                if winner is None and not pending:
+                    launch()
+        finally:
+            now = time.monotonic()
+            for unfinished, route in pending.items():
+                unfinished.cancel()
+                if winner_launched is not None and launched_at[unfinished] <= winner_launched:
+                    # Overtaken by a hedge started after it: its latency is at least this long.
+                    # Recording it keeps a slow-but-not-failing route's p95 and breaker honest.
+                    elapsed = now - launched_at[unfinished]
+                    route.overtaken += 1
+                    route.latency.add(elapsed)
+                    route.breaker.record_overtaken(elapsed)
+                else:
+                    route.breaker.abandon()
+
+        if winner is None:
+            self.fallbacks += 1
+        return winner
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "x-api-key": self.api_key,
+            "anthropic-version": ANTHROPIC_VERSION,
+            "content-type": "application/json",
+        }
+
+    def _payload(self, route: Route, prompt: str, max_tokens: int, stream: bool = False) -> Dict:
+        payload = {
+            "model": route.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _record_failure(self, route: Route, started: float, error: Exception):
+        latency = time.monotonic() - started
+        route.errors += 1
+        route.breaker.record(False, latency)
+        logger.error(f"LLM call on {route.name} failed after {latency:.2f}s: {error}")
+
+    def _record_success(self, route: Route, started: float):
+        latency = time.monotonic() - started
+        route.latency.add(latency)
+        route.breaker.record(True, latency)
+
+    async def _call(self, route: Route, prompt: str, max_tokens: int) -> Optional[str]:
+        route.calls += 1
+        started = time.monotonic()
+        try:
+            response = await self.client.post(
+                self.api_url, json=self._payload(route, prompt, max_tokens), headers=self._headers()
+            )
+            response.raise_for_status()
+            text = response.json()["content"][0]["text"]
+        except Exception as e:
+            self._record_failure(route, started, e)
+            return None
+
+        self._record_success(route, started)
+        return text
+
+    async def _open_stream(self, route: Route, prompt: str, max_tokens: int) -> Optional["_OpenStream"]:
+        """Start a streaming request and wait for its first text delta.
+
+        For streams the route's latency is time-to-first-token.
+        """
+        route.calls += 1
+        started = time.monotonic()
+        response = None
+        try:
+            request = self.client.build_request(
+                "POST", self.api_url, json=self._payload(route, prompt, max_tokens, stream=True),
+                headers=self._headers(),
+            )
+            response = await self.client.send(request, stream=True)
+            response.raise_for_status()
+            deltas = _iter_text_deltas(response)
+            first = await deltas.__anext__()
+        except asyncio.CancelledError:
+            if response is not None:
+                await response.aclose()
+            raise
+        except Exception as e:
+            if response is not None:
+                await response.aclose()
+            if isinstance(e, StopAsyncIteration):
+                e = RuntimeError("stream ended before any text")
+            self._record_failure(route, started, e)
+            return None
+
+        self._record_success(route, started)
+        return _OpenStream(route, response, deltas, first, started)
+
+    async def _close_stream(self, opened: "_OpenStream"):
+        await opened.deltas.aclose()
+        await opened.response.aclose()
+
+    def status(self) -> Dict:
+        return {
+            "routes": {route.name: route.status() for routes in self.routes.values() for route in routes},
+            "hedges": self.hedges,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class _OpenStream:
+    def __init__(self, route: Route, response, deltas, first: str, started: float):
+        self.route = route
+        self.response = response
+        self.deltas = deltas
+        self.first = first
+        self.started = started
+
+
+async def _iter_text_deltas(response) -> AsyncIterator[str]:
+    """Yield the text of each content_block_delta in a messages API event stream."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        event = json.loads(line[5:])
+        kind = event.get("type")
+        if kind == "content_block_delta" and event["delta"].get("type") == "text_delta":
+            yield event["delta"]["text"]
+        elif kind == "error":
+            raise RuntimeError(f"Stream error: {event.get('error')}")
+        elif kind == "message_stop":
+            return
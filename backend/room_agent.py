@@ -0,0 +1,297 @@
+"""Server-side audio ingest straight from LiveKit rooms.
+
+Instead of each browser re-uploading its microphone to /ws/transcribe, a room
+agent joins the LiveKit room as a hidden participant, subscribes to every
+remote audio track and feeds the frames into a TranscriptionService per
+participant. Results go back to the speaker as data messages on the
+"reactions" topic, with the same JSON payloads the WebSocket sends.
+
+Agents run inside the backend (they share its Vosk model, executor and
+admission limits). Rooms listed in AGENT_ROOMS are joined at startup, and
+POST/DELETE /agent/rooms/{room_name} joins or leaves at runtime. An agent
+that loses its connection keeps rejoining with backoff until it is removed;
+one that LiveKit removes on purpose (room closed, participant removed,
+duplicate identity) stops. To try it against a local LiveKit server:
+
+    livekit-server --dev
+    LIVEKIT_URL=ws://localhost:7880 LIVEKIT_API_KEY=devkey LIVEKIT_API_SECRET=secret \\
+        AGENT_ROOMS=test-room python Main.py
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+REACTION_TOPIC = "reactions"
+# LiveKit resamples and downmixes to the recognizer's format before frames reach us
+INGEST_SAMPLE_RATE = 16000
+INGEST_FRAME_MS = 100
+# Backoff between attempts to rejoin a room after the connection is lost
+RECONNECT_MIN_S = 1.0
+RECONNECT_MAX_S = 30.0
+# Disconnects worth rejoining after. Any other reason (duplicate identity, removed by an
+# admin, room deleted or closed) is final and the agent stops.
+TRANSIENT_DISCONNECT_REASONS = {
+    "UNKNOWN_REASON", "SIGNAL_CLOSE", "CONNECTION_TIMEOUT", "SERVER_SHUTDOWN", "MIGRATION", "MEDIA_FAILURE",
+}
+
+
+class RoomAgent:
+    """One backend participant in one LiveKit room, transcribing everyone else in it."""
+
+    def __init__(self, room_name: str, url: str, token_factory, service_factory, executor=None,
+                 admission=None, identity: str = "buddy-agent", reconnect_min: float = RECONNECT_MIN_S,
+                 reconnect_max: float = RECONNECT_MAX_S, on_closed=None):
+        self.room_name = room_name
+        self.url = url
+        self.token_factory = token_factory  # (identity, name, metadata, room_name, agent=True) -> JWT
+        self.service_factory = service_factory  # (participant_identity, emit, room) -> TranscriptionService or None
+        self.executor = executor
+        self.admission = admission
+        self.identity = identity
+        self.room = None
+        self.ingests: Dict[str, asyncio.Task] = {}  # Track SID -> ingest task
+        self.published = 0
+        self.publish_errors = 0
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.reconnects = 0
+        self.on_closed = on_closed  # (agent) -> None, called when the room ends the agent's session for good
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self, retry: bool = False):
+        """Join the room. With retry, a failed first attempt keeps retrying in the background."""
+        try:
+            await self._connect()
+        except Exception as e:
+            if not retry:
+                raise
+            logger.error(f"Room agent failed to join {self.room_name}, retrying: {e}")
+            self._schedule_reconnect()
+
+    async def _connect(self):
+        from livekit import rtc
+
+        room = rtc.Room()
+        room.on("track_subscribed", self._on_track_subscribed)
+        room.on("track_unsubscribed", self._on_track_unsubscribed)
+        room.on("disconnected", lambda reason: self._on_disconnected(room, reason))
+
+        # A fresh token per attempt; they are short-lived
+        token = self.token_factory(self.identity, "Buddy", "", self.room_name, agent=True)
+        # Tracks already published in the room arrive through track_subscribed as well
+        await room.connect(self.url, token, rtc.RoomOptions(auto_subscribe=True))
+        if self._stopping:
+            # Left while the connection was being set up
+            await room.disconnect()
+            return
+        self.room = room
+        logger.info(f"Room agent joined {self.room_name} as {self.identity}")
+
+    def _schedule_reconnect(self):
+        if not self._stopping and self._reconnect_task is None:
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.reconnect_min
+        try:
+            while not self._stopping:
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect()
+                except Exception as e:
+                    delay = min(delay * 2, self.reconnect_max)
+                    logger.warning(f"Room agent could not rejoin {self.room_name}, next try in {delay:.0f}s: {e}")
+                    continue
+                self.reconnects += 1
+                return
+        finally:
+            self._reconnect_task = None
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            try:
+                await self._reconnect_task
+            except asyncio.CancelledError:
+                pass
+            self._reconnect_task = None
+        tasks = list(self.ingests.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.room is not None:
+            await self.room.disconnect()
+            self.room = None
+        logger.info(f"Room agent left {self.room_name}")
+
+    def _on_track_subscribed(self, track, publication, participant):
+        from livekit import rtc
+
+        if track.kind != rtc.TrackKind.KIND_AUDIO:
+            return
+        logger.info(f"Subscribed to audio from {participant.identity} in {self.room_name}")
+        task = asyncio.create_task(self._ingest(track, participant.identity))
+        self.ingests[track.sid] = task
+        task.add_done_callback(lambda done, sid=track.sid: self._forget_ingest(sid, done))
+
+    def _forget_ingest(self, sid: str, task: asyncio.Task):
+        # A resubscribed track may already have a newer ingest under the same SID
+        if self.ingests.get(sid) is task:
+            del self.ingests[sid]
+
+    def _on_track_unsubscribed(self, track, publication, participant):
+        task = self.ingests.get(track.sid)
+        if task:
+            task.cancel()
+
+    def _on_disconnected(self, room, reason):
+        from livekit import rtc
+
+        if room is not self.room or self._stopping:
+            return
+        try:
+            reason = rtc.DisconnectReason.Name(reason)
+        except (TypeError, ValueError):
+            reason = str(reason)
+        # Results for the lost connection are dropped by publish() once room is cleared
+        self.room = None
+        for task in list(self.ingests.values()):
+            task.cancel()
+        if reason in TRANSIENT_DISCONNECT_REASONS:
+            logger.warning(f"Room agent disconnected from {self.room_name}: {reason}")
+            self._schedule_reconnect()
+            return
+        logger.warning(f"Room agent removed from {self.room_name}: {reason}, not rejoining")
+        self._stopping = True
+        if self.on_closed:
+            self.on_closed(self)
+
+    async def _ingest(self, track, identity: str):
+        from livekit import rtc
+
+        if self.admission:
+            refusal = self.admission.admit_session(self.room_name)
+            if refusal:
+                logger.warning(f"Not transcribing {identity} in {self.room_name}: {refusal}")
+                await self.publish(identity, {"type": "error", "message": f"Server busy ({refusal}), please retry"})
+                return
+
+        try:
+            async def emit(message):
+                await self.publish(identity, message)
+
+            service = self.service_factory(identity, emit, self.room_name)
+            if service is None:
+                await self.publish(identity, {"type": "error", "message": "Speech recognition service not available"})
+                return
+
+            room = self.room
+            stream = rtc.AudioStream.from_track(track=track, sample_rate=INGEST_SAMPLE_RATE, num_channels=1,
+                                                frame_size_ms=INGEST_FRAME_MS)
+            try:
+                async for event in stream:
+                    result = await service.process_audio(event.frame.data.tobytes(), self.executor)
+                    if result:
+                        await self.publish(identity, result)
+            finally:
+                await stream.aclose()
+                # Flush the utterance in progress when the speaker leaves or mutes for good, or the
+                # agent leaves. Not when the connection was lost: nobody would receive the analysis.
+                if self.room is not None and self.room is room:
+                    result = await service.finish(self.executor)
+                    if result:
+                        await self.publish(identity, result)
+        finally:
+            if self.admission:
+                self.admission.release_session(self.room_name)
+
+    async def publish(self, identity: str, message: Dict):
+        """Send a result to the participant it belongs to. Partials are sent lossy; they are superseded anyway."""
+        if self.room is None:
+            return
+        message["participant"] = identity
+        try:
+            await self.room.local_participant.publish_data(
+                json.dumps(message),
+                reliable=message.get("type") != "partial",
+                destination_identities=[identity],
+                topic=REACTION_TOPIC,
+            )
+            self.published += 1
+        except Exception as e:
+            self.publish_errors += 1
+            logger.error(f"Failed to publish {message.get('type')} to {identity} in {self.room_name}: {e}")
+
+    def status(self) -> Dict:
+        return {
+            "connected": self.room is not None and self.room.isconnected(),
+            "reconnecting": self._reconnect_task is not None,
+            "reconnects": self.reconnects,
+            "participants": len(self.ingests),
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+        }
+
+
+class RoomAgentManager:
+    """The room agents running in this process, keyed by room name."""
+
+    def __init__(self, url: Optional[str], token_factory, service_factory, executor=None, admission=None,
+                 identity: str = "buddy-agent", **agent_options):
+        self.url = url
+        self.token_factory = token_factory
+        self.service_factory = service_factory
+        self.executor = executor
+        self.admission = admission
+        self.identity = identity
+        self.agent_options = agent_options  # Extra RoomAgent arguments, e.g. reconnect backoff
+        self.agents: Dict[str, RoomAgent] = {}
+        self._join_locks: Dict[str, asyncio.Lock] = {}
+
+    async def join(self, room_name: str, retry: bool = False) -> RoomAgent:
+        """Join a room; an agent that loses its connection later rejoins with backoff.
+
+        With retry, the agent is kept (and keeps retrying) even if the first attempt fails.
+        """
+        # Concurrent joins (e.g. the startup AGENT_ROOMS join and a POST) must share one agent;
+        # two agents with the same identity would keep kicking each other out of the room
+        lock = self._join_locks.setdefault(room_name, asyncio.Lock())
+        async with lock:
+            if room_name in self.agents:
+                return self.agents[room_name]
+            if not self.url:
+                raise RuntimeError("LIVEKIT_URL is not defined")
+            agent = RoomAgent(room_name, self.url, self.token_factory, self.service_factory,
+                              executor=self.executor, admission=self.admission, identity=self.identity,
+                              on_closed=self._forget, **self.agent_options)
+            # Registered before connecting so a leave() during the join stops it
+            self.agents[room_name] = agent
+            try:
+                await agent.start(retry=retry)
+            except BaseException:
+                if self.agents.get(room_name) is agent:
+                    del self.agents[room_name]
+                raise
+            return agent
+
+    def _forget(self, agent: RoomAgent):
+        if self.agents.get(agent.room_name) is agent:
+            del self.agents[agent.room_name]
+
+    async def leave(self, room_name: str) -> bool:
+        agent = self.agents.pop(room_name, None)
+        if agent is None:
+            return False
+        await agent.stop()
+        return True
+
+    async def stop(self):
+        await asyncio.gather(*(self.leave(room_name) for room_name in list(self.agents)), return_exceptions=True)
+
+    def status(self) -> Dict:
+        return {room_name: agent.status() for room_name, agent in self.agents.items()}
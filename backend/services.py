@@ -3,32 +3,16 @@ import json
 import logging
 import time
 from typing import Optional, Dict, Any
-from vosk import KaldiRecognizer
-# Removed circular import - will get these from constructor parameters
-from vosk import Model, KaldiRecognizer
-import httpx
-import os
-from dotenv import load_dotenv
 
-# from Main import process_data  # Circular import - will be handled differently
-
-load_dotenv()
-
-VOSK_MODEL_PATH = "vosk-model"
-VOSK_SAMPLE_RATE = 16000
-ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
-
-# LOGGING
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 FILLER_WORDS = {"um", "uh", "like", "so", "you know", "actually", "basically", "literally", "well", "right"}
 
 class SessionMetrics:
-    def __init__(self):
+    def __init__(self, clock=time.time):
+        self.clock = clock
         self.word_count = 0
-        self.start_time = time.time()
+        self.start_time = clock()
         self.filler_count = 0
         self.sentences = []
 
@@ -43,7 +27,7 @@ class SessionMetrics:
                 self.filler_count += 1
 
     def get_wpm(self) -> int:
-        elapsed_minutes = (time.time() - self.start_time) / 60
+        elapsed_minutes = (self.clock() - self.start_time) / 60
         if elapsed_minutes == 0:
             return 0
         return round(self.word_count / elapsed_minutes)
@@ -55,78 +39,88 @@ class SessionMetrics:
         return max(0, round(100 - (filler_ratio * 100)))
 
 class TranscriptionService:
-    def __init__(self, vosk_model, sample_rate: int, process_data_func, profile):
+    def __init__(self, vosk_model, sample_rate: int, process_data_func, profile, clock=time.time, emit=None,
+                 admission=None, room: str = "default"):
         if vosk_model is None:
             raise ValueError("Vosk model not loaded - cannot create transcription service")
+        # Imported here so modules that only need metrics don't pay for vosk
+        from vosk import KaldiRecognizer
         self.recognizer = KaldiRecognizer(vosk_model, sample_rate)
-        self.metrics = SessionMetrics()
+        # Wall clock by default; batch mode passes an audio-position clock instead
+        self.clock = clock
+        self.metrics = SessionMetrics(clock)
         self.process_data = process_data_func
+        self.emit = emit  # Optional async callable for results pushed before the final one
         self.profile = profile  # Store the user's profile
+        # Optional AdmissionController that bounds recognizer work and sheds partials under load
+        self.admission = admission
+        self.room = room
+        # AudioConverter for clients that send audio in something other than 16 kHz mono int16
+        self.converter = None
         logger.info(f"TranscriptionService initialized for {self.profile.name}")
 
+    def set_audio_format(self, audio_format):
+        """Convert subsequent audio from the client's declared format before recognition."""
+        from audio import AudioConverter
+        self.converter = None if audio_format.is_native else AudioConverter(audio_format)
+
+    def _accept_waveform(self, data: bytes) -> bool:
+        # Runs on the executor thread so conversion stays off the event loop
+        if self.converter:
+            data = self.converter.convert(data)
+            if not data:
+                return False
+        return self.recognizer.AcceptWaveform(data)
+
     async def process_audio(self, data: bytes, executor=None) -> Optional[Dict[str, Any]]:
-        try:
-            # Use the provided executor or fall back to asyncio.to_thread
-            if executor:
-                loop = asyncio.get_event_loop()
-                accept_result = await loop.run_in_executor(executor, self.recognizer.AcceptWaveform, data)
-            else:
-                accept_result = await asyncio.to_thread(self.recognizer.AcceptWaveform, data)
+        # Under overload the chunk is dropped rather than queued behind the recognizer
+        if self.admission and not self.admission.start_chunk(self.room):
+            return None
 
-            if accept_result:
-                # Also run the Result() call in the executor to avoid blocking
+        try:
+            final_text = None
+            try:
+                # Use the provided executor or fall back to asyncio.to_thread
                 if executor:
                     loop = asyncio.get_event_loop()
-                    result_text = await loop.run_in_executor(executor, self.recognizer.Result)
-                    result = json.loads(result_text)
+                    accept_result = await loop.run_in_executor(executor, self._accept_waveform, data)
                 else:
-                    result_text = await asyncio.to_thread(self.recognizer.Result)
-                    result = json.loads(result_text)
-                
-                if result.get('text'):
-                    text = result['text']
-                    logger.info(f"Final transcript: '{text}'")
-
-                    self.metrics.add_transcript(text)
-
-                    data_packet = {
-                        "profile_name": self.profile.name,  # Use the stored profile name
-                        "message": text,
-                        "timestamp": time.time(),
-                        "metrics": {
-                            "wpm": self.metrics.get_wpm(),
-                            "filler_words": self.metrics.filler_count,
-                            "clarity_score": self.metrics.get_clarity_score(),
-                            "word_count": self.metrics.word_count
+                    accept_result = await asyncio.to_thread(self._accept_waveform, data)
+
+                if accept_result:
+                    # Also run the Result() call in the executor to avoid blocking
+                    if executor:
+                        loop = asyncio.get_event_loop()
+                        result_text = await loop.run_in_executor(executor, self.recognizer.Result)
+                        result = json.loads(result_text)
+                    else:
+                        result_text = await asyncio.to_thread(self.recognizer.Result)
+                        result = json.loads(result_text)
+
+                    final_text = result.get('text')
+                elif not (self.admission and self.admission.skip_partials(self.room)):
+                    # Also run PartialResult() in the executor
+                    if executor:
+                        loop = asyncio.get_event_loop()
+                        partial_text = await loop.run_in_executor(executor, self.recognizer.PartialResult)
+                        partial_result = json.loads(partial_text)
+                    else:
+                        partial_text = await asyncio.to_thread(self.recognizer.PartialResult)
+                        partial_result = json.loads(partial_text)
+
+                    if partial_result.get('partial'):
+                        return {
+                            "type": "partial",
+                            "transcript": partial_result['partial'],
+                            "timestamp": self.clock()
                         }
-                    }
-
-                    processed = await self.process_data(data_packet)
-
-                    return {
-                        "type": "final",
-                        "transcript": text,
-                        "animation_trigger": processed.get("emotion", "speaking"),
-                        "metrics": data_packet["metrics"],
-                        "timestamp": data_packet["timestamp"],
-                        "current_emotion": processed.get("emotion", "speaking")
-                    }
-            else:
-                # Also run PartialResult() in the executor
-                if executor:
-                    loop = asyncio.get_event_loop()
-                    partial_text = await loop.run_in_executor(executor, self.recognizer.PartialResult)
-                    partial_result = json.loads(partial_text)
-                else:
-                    partial_text = await asyncio.to_thread(self.recognizer.PartialResult)
-                    partial_result = json.loads(partial_text)
-                
-                if partial_result.get('partial'):
-                    return {
-                        "type": "partial",
-                        "transcript": partial_result['partial'],
-                        "timestamp": time.time()
-                    }
+            finally:
+                # The recognizer slot is released before the (slow) LLM analysis
+                if self.admission:
+                    self.admission.finish_chunk(self.room)
+
+            if final_text:
+                return await self._handle_final(final_text)
 
         except Exception as e:
             logger.error(f"Error processing audio: {e}")
@@ -136,3 +130,52 @@ class TranscriptionService:
             }
 
         return None
+
+    async def _handle_final(self, text: str) -> Dict[str, Any]:
+        logger.info(f"Final transcript: '{text}'")
+
+        self.metrics.add_transcript(text)
+
+        data_packet = {
+            "profile_name": self.profile.name,  # Use the stored profile name
+            "room": self.room,
+            "message": text,
+            "timestamp": self.clock(),
+            "metrics": {
+                "wpm": self.metrics.get_wpm(),
+                "filler_words": self.metrics.filler_count,
+                "clarity_score": self.metrics.get_clarity_score(),
+                "word_count": self.metrics.word_count
+            }
+        }
+
+        processed = await self.process_data(data_packet, emit=self.emit)
+
+        return {
+            "type": "final",
+            "transcript": text,
+            "animation_trigger": processed.get("emotion", "speaking"),
+            "metrics": data_packet["metrics"],
+            "timestamp": data_packet["timestamp"],
+            "current_emotion": processed.get("emotion", "speaking")
+        }
+
+    async def finish(self, executor=None) -> Optional[Dict[str, Any]]:
+        """Flush the recognizer at end of stream and handle any trailing utterance."""
+        try:
+            if executor:
+                loop = asyncio.get_event_loop()
+                result_text = await loop.run_in_executor(executor, self.recognizer.FinalResult)
+            else:
+                result_text = await asyncio.to_thread(self.recognizer.FinalResult)
+            result = json.loads(result_text)
+            if result.get('text'):
+                return await self._handle_final(result['text'])
+        except Exception as e:
+            logger.error(f"Error finishing audio stream: {e}")
+            return {
+                "type": "error",
+                "message": f"Audio processing error: {str(e)}"
+            }
+
+        return None
@@ -0,0 +1,57 @@
+"""Startup-time accounting.
+
+Heavy dependencies (vosk, httpx, livekit) are imported on first use
+through lazy_import(), and startup work is wrapped in profiler.phase(). With
+STARTUP_PROFILE=1 the breakdown is logged once the server is ready and
+reported under "startup" on /status. For a full per-module view use
+`python -X importtime Main.py`.
+"""
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Captured as early as possible so "process" covers interpreter start-up too
+_PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.phases = {}
+        self.imports = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def lazy_import(self, module_name: str):
+        """Import a module on first use, recording how long the first import took."""
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.imports[module_name] = round((time.perf_counter() - started) * 1000, 1)
+        if self.enabled:
+            logger.info(f"Imported {module_name} in {self.imports[module_name]} ms")
+        return module
+
+    def mark_ready(self):
+        self.phases["ready_since_process_start"] = round((time.perf_counter() - _PROCESS_START) * 1000, 1)
+        if self.enabled:
+            logger.info(f"Startup breakdown (ms): {self.report()}")
+
+    def report(self):
+        return {"phases_ms": dict(self.phases), "imports_ms": dict(self.imports)}
+
+
+# Enabled from Settings.startup_profile once the config has been loaded
+profiler = StartupProfiler(enabled=False)
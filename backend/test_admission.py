@@ -0,0 +1,101 @@
+from admission import AdmissionController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_controller(clock, **options):
+    defaults = {"max_queued_chunks": 20, "max_queued_chunks_per_room": 20, "refuse_sessions_at": 0.9,
+                "shed_partials_at": 0.5, "shed_llm_at": 0.8, "smoothing": 2.0}
+    defaults.update(options)
+    return AdmissionController(clock=clock, **defaults)
+
+
+def fill_chunks(controller, room, count):
+    for _ in range(count):
+        assert controller.start_chunk(room)
+
+
+def test_momentary_spike_does_not_refuse_sessions():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    assert controller.admit_session("a") is None
+
+    fill_chunks(controller, "a", 20)
+    clock.now += 0.1
+    assert controller.chunk_pressure("a") == 1.0
+    assert controller.admit_session("a") is None
+
+
+def test_sustained_backlog_refuses_before_admitted_audio_is_dropped():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    assert controller.admit_session("a") is None
+
+    fill_chunks(controller, "a", 19)
+    clock.now += 10.0
+    # Admitted sessions still have room for chunks...
+    assert controller.start_chunk("a")
+    controller.finish_chunk("a")
+    # ...but new sessions are already turned away
+    assert controller.admit_session("a") == "speech recognition is saturated"
+    assert controller.shed["dropped_chunks"] == 0
+
+
+def test_refusal_clears_once_the_backlog_drains():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    assert controller.admit_session("a") is None
+    fill_chunks(controller, "a", 20)
+    clock.now += 10.0
+    assert controller.admit_session("a") is not None
+
+    for _ in range(20):
+        controller.finish_chunk("a")
+    clock.now += 10.0
+    assert controller.admit_session("a") is None
+
+
+def test_degradation_order():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    assert controller.admit_session("a") is None
+
+    fill_chunks(controller, "a", 12)
+    clock.now += 10.0
+    assert controller.skip_partials("a")
+    assert controller.acquire_llm("a")
+    controller.release_llm("a")
+    assert controller.admit_session("a") is None
+
+    fill_chunks(controller, "a", 5)
+    clock.now += 10.0
+    assert not controller.acquire_llm("a")
+    assert controller.admit_session("a") is None
+
+    fill_chunks(controller, "a", 2)
+    clock.now += 10.0
+    assert controller.admit_session("a") is not None
+
+
+def test_hard_limit_drops_chunks():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    fill_chunks(controller, "a", 20)
+    assert not controller.start_chunk("a")
+    assert controller.shed["dropped_chunks"] == 1
+
+
+def test_room_history_is_released_with_the_room():
+    clock = FakeClock()
+    controller = make_controller(clock)
+    assert controller.admit_session("a") is None
+    assert controller.start_chunk("a")
+    controller.release_session("a")
+    controller.finish_chunk("a")
+    assert "a" not in controller.room_smoothed_chunks
@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+from audio import AudioConverter, AudioFormat, TARGET_SAMPLE_RATE
+
+
+def tone(rate, freq, seconds=1.0, amplitude=0.5):
+    t = np.arange(int(rate * seconds)) / rate
+    return amplitude * np.sin(2 * np.pi * freq * t)
+
+
+def encode(signal, sample_format, channels):
+    if sample_format == "float32":
+        samples = signal.astype("<f4")
+    else:
+        samples = np.round(signal * 32767).astype("<i2")
+    return np.repeat(samples[:, None], channels, axis=1).tobytes()
+
+
+def convert(fmt, raw, split=None):
+    converter = AudioConverter(fmt)
+    if split is None:
+        out = converter.convert(raw)
+    else:
+        parts, pos = [], 0
+        while pos < len(raw):
+            size = split()
+            parts.append(converter.convert(memoryview(raw)[pos:pos + size]))
+            pos += size
+        out = b"".join(parts)
+    return np.frombuffer(out, dtype="<i2").astype(np.float64)
+
+
+def rms(samples):
+    return float(np.sqrt(np.mean(samples ** 2)))
+
+
+@pytest.mark.parametrize("rate,sample_format,channels", [
+    (48000, "float32", 2),
+    (44100, "float32", 1),
+    (22050, "int16", 2),
+    (8000, "int16", 1),
+    (16000, "float32", 1),
+])
+def test_chunked_conversion_matches_contiguous(rate, sample_format, channels):
+    fmt = AudioFormat(rate, sample_format, channels)
+    raw = encode(tone(rate, 440), sample_format, channels)
+    rng = random.Random(rate)
+
+    contiguous = convert(fmt, raw)
+    chunked = convert(fmt, raw, split=lambda: rng.randint(1, 5000))
+
+    assert len(contiguous) == len(chunked)
+    assert np.array_equal(contiguous, chunked)
+
+
+@pytest.mark.parametrize("rate,freq", [
+    (48000, 12000),
+    (48000, 20000),
+    (44100, 10000),
+    (32000, 9000),
+])
+def test_downsampling_rejects_content_above_the_target_nyquist(rate, freq):
+    fmt = AudioFormat(rate, "float32", 1)
+    out = convert(fmt, encode(tone(rate, freq), "float32", 1))
+    # Skip the filter's start-up transient
+    reference = rms(tone(rate, 1000)) * 32767
+    assert rms(out[200:]) < reference * 10 ** (-50 / 20)
+
+
+@pytest.mark.parametrize("rate", [48000, 44100, 22050])
+def test_downsampling_keeps_speech_band(rate):
+    fmt = AudioFormat(rate, "float32", 1)
+    out = convert(fmt, encode(tone(rate, 1000), "float32", 1))
+    expected = rms(tone(TARGET_SAMPLE_RATE, 1000)) * 32767
+    assert abs(rms(out[200:]) / expected - 1) < 0.05
+
+
+def test_native_audio_passes_through():
+    raw = encode(tone(TARGET_SAMPLE_RATE, 440), "int16", 1)
+    assert AudioConverter(AudioFormat()).convert(raw) is raw
+
+
+def test_invalid_config_is_rejected():
+    with pytest.raises(ValueError):
+        AudioFormat.from_message({"sample_format": "int8"})
+    with pytest.raises(ValueError):
+        AudioFormat.from_message({"sample_rate": "fast"})
@@ -0,0 +1,136 @@
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from audio import AudioFormat
+from batch import (
+    WAVE_FORMAT_EXTENSIBLE,
+    WAVE_FORMAT_IEEE_FLOAT,
+    WAVE_FORMAT_PCM,
+    AudioClock,
+    AudioFormatError,
+    _find_wav_data,
+    iter_chunks,
+    open_pcm,
+)
+
+
+def write_wav(path, samples, rate=16000, channels=1):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.astype("<i2").tobytes())
+
+
+def chunk(chunk_id, body):
+    return chunk_id + struct.pack("<I", len(body)) + body + (b"\0" if len(body) & 1 else b"")
+
+
+def fmt_chunk(tag, rate, channels, bits):
+    block = channels * bits // 8
+    return chunk(b"fmt ", struct.pack("<HHIIHH", tag, channels, rate, rate * block, block, bits))
+
+
+def extensible_fmt_chunk(subformat, rate, channels, bits):
+    block = channels * bits // 8
+    body = struct.pack("<HHIIHH", WAVE_FORMAT_EXTENSIBLE, channels, rate, rate * block, block, bits)
+    # cbSize, valid bits, channel mask, then the SubFormat GUID starting with the real format tag
+    body += struct.pack("<HHI", 22, bits, 0x3) + struct.pack("<H", subformat) + bytes(14)
+    return chunk(b"fmt ", body)
+
+
+def riff(*chunks):
+    body = b"WAVE" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def test_wave_module_output_is_parsed(tmp_path):
+    samples = np.arange(-1000, 1000, dtype=np.int16)
+    path = tmp_path / "speech.wav"
+    write_wav(path, samples, rate=22050, channels=2)
+
+    with open_pcm(str(path)) as (view, fmt):
+        assert fmt.to_dict() == {"sample_rate": 22050, "sample_format": "int16", "channels": 2}
+        assert bytes(view) == samples.tobytes()
+
+
+def test_extensible_float_subformat():
+    samples = np.linspace(-1, 1, 64, dtype="<f4").tobytes()
+    view, fmt = _find_wav_data(riff(extensible_fmt_chunk(WAVE_FORMAT_IEEE_FLOAT, 48000, 2, 32), chunk(b"data", samples)))
+    assert fmt.to_dict() == {"sample_rate": 48000, "sample_format": "float32", "channels": 2}
+    assert bytes(view) == samples
+
+
+def test_extensible_pcm_subformat():
+    view, fmt = _find_wav_data(riff(extensible_fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 16), chunk(b"data", bytes(8))))
+    assert fmt.is_native
+    assert len(view) == 8
+
+
+def test_odd_sized_chunks_are_padded():
+    data = bytes(range(10))
+    buf = riff(chunk(b"LIST", b"odd"), fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 16), chunk(b"junk", b"x"),
+               chunk(b"data", data))
+    view, fmt = _find_wav_data(buf)
+    assert bytes(view) == data
+
+
+def test_truncated_data_chunk_stops_at_end_of_file():
+    buf = riff(fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 16), chunk(b"data", bytes(100)))[:-40]
+    view, _ = _find_wav_data(buf)
+    assert len(view) == 60
+
+
+@pytest.mark.parametrize("buf,message", [
+    (b"", "not a RIFF/WAVE"),
+    (b"RIFF\0\0\0\0AVI ", "not a RIFF/WAVE"),
+    (riff(chunk(b"data", bytes(4))), "data chunk before fmt"),
+    (riff(fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 16)), "no data chunk"),
+    (riff(fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 16))[:-6], "truncated fmt"),
+    (riff(extensible_fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 16))[:-20], "truncated fmt"),
+    (riff(fmt_chunk(WAVE_FORMAT_PCM, 16000, 1, 8), chunk(b"data", bytes(4))), "8-bit"),
+    (riff(fmt_chunk(WAVE_FORMAT_PCM, 4000, 1, 16), chunk(b"data", bytes(4))), "sample_rate"),
+])
+def test_invalid_wav_is_rejected(buf, message):
+    with pytest.raises(AudioFormatError, match=message):
+        _find_wav_data(buf)
+
+
+def test_empty_wav_file_is_rejected(tmp_path):
+    path = tmp_path / "empty.wav"
+    path.write_bytes(b"")
+    with pytest.raises(AudioFormatError):
+        with open_pcm(str(path)):
+            pass
+
+
+def test_raw_pcm_is_native(tmp_path):
+    path = tmp_path / "speech.pcm"
+    path.write_bytes(bytes(320))
+    with open_pcm(str(path)) as (view, fmt):
+        assert fmt.is_native
+        assert len(view) == 320
+
+    path.write_bytes(b"")
+    with open_pcm(str(path)) as (view, fmt):
+        assert len(view) == 0
+
+
+def test_iter_chunks_covers_the_view_without_copying():
+    data = bytearray(range(250))
+    chunks = list(iter_chunks(memoryview(data), 100))
+    assert [len(c) for c in chunks] == [100, 100, 50]
+    assert b"".join(chunks) == bytes(data)
+    data[0] = 99
+    assert chunks[0][0] == 99
+
+
+def test_audio_clock_counts_frames():
+    clock = AudioClock(AudioFormat(48000, "float32", 2))
+    clock.advance(48000 * 4)  # Half a second of stereo float32
+    assert clock() == 0.5
+    clock.advance(8 * 3 + 5)  # A partial frame is not counted
+    assert clock() == pytest.approx(0.5 + 3 / 48000)
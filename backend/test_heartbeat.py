@@ -0,0 +1,111 @@
+import asyncio
+
+from heartbeat import CLOSE_IDLE, PING_FRAME, HeartbeatManager
+
+
+class FakeWebSocket:
+    def __init__(self, close_delay=0.0, fail_send=False):
+        self.sent = []
+        self.closes = []
+        self.close_delay = close_delay
+        self.fail_send = fail_send
+
+    async def send_text(self, text):
+        if self.fail_send:
+            raise RuntimeError("connection reset")
+        self.sent.append(text)
+
+    async def close(self, code=1000, reason=None):
+        self.closes.append(code)
+        await asyncio.sleep(self.close_delay)
+
+
+def make_idle(manager, session):
+    session.last_seen -= manager.idle_timeout + 1
+
+
+def test_sweep_closes_idle_sessions_and_pings_live_ones():
+    manager = HeartbeatManager(ping_interval=10, idle_timeout=30)
+    idle_socket, live_socket = FakeWebSocket(), FakeWebSocket()
+    idle = manager.register(idle_socket, "idle")
+    manager.register(live_socket, "live")
+    make_idle(manager, idle)
+
+    asyncio.run(manager.sweep())
+
+    assert idle_socket.closes == [CLOSE_IDLE]
+    assert idle_socket.sent == []
+    assert live_socket.sent == [PING_FRAME]
+    assert live_socket.closes == []
+    assert manager.idle_closed == 1
+    assert manager.status() == {"sessions": 1, "idle_closed": 1}
+
+
+def test_touch_keeps_a_session_alive():
+    manager = HeartbeatManager(ping_interval=10, idle_timeout=30)
+    websocket = FakeWebSocket()
+    session = manager.register(websocket, "alice")
+    make_idle(manager, session)
+    session.touch()
+
+    asyncio.run(manager.sweep())
+
+    assert websocket.closes == []
+    assert websocket.sent == [PING_FRAME]
+    assert manager.idle_closed == 0
+
+
+def test_slow_close_is_not_picked_up_again():
+    async def run():
+        manager = HeartbeatManager(ping_interval=10, idle_timeout=30)
+        websocket = FakeWebSocket(close_delay=0.05)
+        make_idle(manager, manager.register(websocket, "slow"))
+
+        first = asyncio.create_task(manager.sweep())
+        await asyncio.sleep(0)  # First sweep is now waiting on close()
+        await manager.sweep()
+        await first
+        return manager, websocket
+
+    manager, websocket = asyncio.run(run())
+    assert websocket.closes == [CLOSE_IDLE]
+    assert manager.idle_closed == 1
+    assert manager.sessions == {}
+
+
+def test_failed_ping_does_not_stop_the_sweep():
+    manager = HeartbeatManager(ping_interval=10, idle_timeout=30)
+    broken, healthy = FakeWebSocket(fail_send=True), FakeWebSocket()
+    manager.register(broken, "broken")
+    manager.register(healthy, "healthy")
+
+    asyncio.run(manager.sweep())
+
+    assert healthy.sent == [PING_FRAME]
+
+
+def test_unregistered_sessions_are_not_pinged():
+    manager = HeartbeatManager(ping_interval=10, idle_timeout=30)
+    websocket = FakeWebSocket()
+    manager.unregister(manager.register(websocket, "gone"))
+
+    asyncio.run(manager.sweep())
+
+    assert websocket.sent == []
+
+
+def test_started_manager_sweeps_periodically():
+    async def run():
+        manager = HeartbeatManager(ping_interval=0.01, idle_timeout=30)
+        websocket = FakeWebSocket()
+        manager.register(websocket, "alice")
+        manager.start()
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        pings = len(websocket.sent)
+        await asyncio.sleep(0.03)
+        return pings, len(websocket.sent)
+
+    pings, later = asyncio.run(run())
+    assert pings >= 2
+    assert later == pings
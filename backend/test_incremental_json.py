@@ -0,0 +1,63 @@
+import json
+import random
+
+import pytest
+
+from incremental_json import IncrementalJSONParser
+
+DOCUMENT = {
+    "interest": 0.8,
+    "confidence": 0.55,
+    "profession": "Engineer, \"senior\" {platform}",
+    "memory": {"topic": "latency [p95]", "nested": {"a": [1, 2, {"b": "}"}]}},
+    "wps": 3,
+}
+
+
+def feed_all(parser, text, fragment_sizes):
+    members = []
+    pos = 0
+    for size in fragment_sizes:
+        members.extend(parser.feed(text[pos:pos + size]))
+        pos += size
+    members.extend(parser.feed(text[pos:]))
+    return members
+
+
+def test_members_are_reported_in_order_for_any_fragmentation():
+    text = json.dumps(DOCUMENT)
+    rng = random.Random(7)
+    for _ in range(50):
+        parser = IncrementalJSONParser()
+        sizes = [rng.randint(1, 8) for _ in range(len(text))]
+        members = feed_all(parser, text, sizes)
+        assert members == list(DOCUMENT.items())
+        assert parser.done
+        assert parser.result() == DOCUMENT
+
+
+def test_early_fields_are_available_before_the_object_closes():
+    text = json.dumps(DOCUMENT)
+    parser = IncrementalJSONParser()
+    cut = text.index('"profession"')
+    assert parser.feed(text[:cut]) == [("interest", 0.8), ("confidence", 0.55)]
+    assert not parser.done
+
+
+@pytest.mark.parametrize("preamble", [
+    "```json\n",
+    "Here is [the] result: ",
+    'The "updated" state (see below) ]} follows:\n',
+])
+def test_preamble_before_the_object_is_ignored(preamble):
+    parser = IncrementalJSONParser()
+    members = parser.feed(preamble + json.dumps(DOCUMENT) + "\n```")
+    assert members == list(DOCUMENT.items())
+    assert parser.result() == DOCUMENT
+
+
+def test_result_raises_when_the_stream_ends_early():
+    parser = IncrementalJSONParser()
+    parser.feed('{"interest": 0.8, "confid')
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_router import CircuitBreaker, LLMRouter
+
+
+def make_router(**breaker_options):
+    options = {"min_samples": 5, "max_error_rate": 0.5, "max_latency": 0.5, "cooldown": 60}
+    options.update(breaker_options)
+    return LLMRouter(
+        api_url="http://llm.invalid/v1/messages",
+        api_key="test",
+        tiers={"primary": "primary-model", "fast": "fast-model"},
+        task_routes={"profile": ["primary", "fast"]},
+        hedge_min=0.02,
+        hedge_max=0.05,
+        breaker_options=options,
+    )
+
+
+def fake_start(delays, failures=()):
+    """A start(route) that answers with the tier name after delays[tier] seconds."""
+    async def start(route):
+        await asyncio.sleep(delays[route.tier])
+        if route.tier in failures:
+            return None
+        return route.tier
+    return start
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = CircuitBreaker(min_samples=5, max_error_rate=0.5)
+    for ok in (True, False, False, True, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_opens_on_p95_latency():
+    breaker = CircuitBreaker(min_samples=5, max_latency=1.0)
+    for _ in range(4):
+        breaker.record(True, 0.1)
+    assert breaker.state == "closed"
+    breaker.record(True, 3.0)
+    assert breaker.state == "open"
+
+
+def test_breaker_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(min_samples=1, max_error_rate=0.0, cooldown=0.0)
+    breaker.record(False, 0.1)
+    assert breaker.state == "open"
+
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record(True, 0.1)
+    assert breaker.state == "closed"
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(min_samples=1, max_error_rate=0.0, cooldown=0.0)
+    breaker.record(False, 0.1)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+
+
+def test_abandoned_probe_frees_the_probe_slot():
+    breaker = CircuitBreaker(min_samples=1, max_error_rate=0.0, cooldown=0.0)
+    breaker.record(False, 0.1)
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_overtaken_probe_reopens():
+    breaker = CircuitBreaker(min_samples=1, max_error_rate=0.0, cooldown=0.0)
+    breaker.record(False, 0.1)
+    assert breaker.allow()
+    breaker.record_overtaken(0.05)
+    assert breaker.state == "open"
+
+
+def test_breaker_opens_when_mostly_overtaken():
+    breaker = CircuitBreaker(min_samples=5, max_latency=10.0, max_overtaken_rate=0.5)
+    breaker.record(True, 0.1)
+    breaker.record(True, 0.1)
+    for _ in range(3):
+        breaker.record_overtaken(1.0)
+    assert breaker.state == "open"
+
+
+def test_fast_primary_is_not_hedged():
+    router = make_router()
+    result = asyncio.run(router._race("profile", fake_start({"primary": 0.0, "fast": 0.0})))
+    assert result == "primary"
+    assert router.hedges == 0
+
+
+def test_slow_primary_is_hedged_and_fast_tier_wins():
+    router = make_router()
+    result = asyncio.run(router._race("profile", fake_start({"primary": 1.0, "fast": 0.0})))
+    assert result == "fast"
+    assert router.hedges == 1
+    primary, fast = router.routes["profile"]
+    assert fast.wins == 1
+    assert primary.overtaken == 1
+
+
+def test_failed_primary_fails_over_without_waiting_for_the_hedge_deadline():
+    router = make_router()
+    router.hedge_min = router.hedge_max = 10.0
+    started = time.monotonic()
+    result = asyncio.run(router._race("profile", fake_start({"primary": 0.0, "fast": 0.0}, failures={"primary"})))
+    assert result == "fast"
+    assert time.monotonic() - started < 1.0
+    assert router.hedges == 0
+
+
+def test_hedge_that_loses_to_an_earlier_call_is_not_recorded():
+    router = make_router()
+    result = asyncio.run(router._race("profile", fake_start({"primary": 0.1, "fast": 1.0})))
+    assert result == "primary"
+    primary, fast = router.routes["profile"]
+    assert router.hedges == 1
+    assert fast.overtaken == 0
+    assert len(fast.latency.samples) == 0
+    assert len(fast.breaker.outcomes) == 0
+
+
+def test_slow_primary_that_keeps_losing_hedges_opens_its_breaker():
+    # Primary never fails, it is just slower than the hedge deadline every time
+    router = make_router(max_latency=10.0)
+    start = fake_start({"primary": 5.0, "fast": 0.0})
+
+    async def run():
+        return [await router._race("profile", start) for _ in range(10)]
+
+    assert asyncio.run(run()) == ["fast"] * 10
+    primary, fast = router.routes["profile"]
+    assert primary.breaker.state == "open"
+    assert primary.latency.percentile(95) is not None
+    # Once open, requests go straight to the fast tier without waiting for a hedge
+    assert router.hedges < 10
+
+
+def test_no_healthy_route_returns_none():
+    router = make_router()
+    for route in router.routes["profile"]:
+        route.breaker._open()
+    result = asyncio.run(router._race("profile", fake_start({"primary": 0.0, "fast": 0.0})))
+    assert result is None
+    assert router.fallbacks == 1
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["content-length"]))
+        body = json.dumps({"content": [{"type": "text", "text": "ok"}]}).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_client_survives_a_new_event_loop():
+    # Batch mode calls asyncio.run() per file with one router per worker process
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        router = make_router()
+        router.api_url = f"http://127.0.0.1:{server.server_port}/v1/messages"
+        for _ in range(3):
+            assert asyncio.run(router.complete("profile", "hi", max_tokens=5)) == "ok"
+        assert all(route.errors == 0 for route in router.routes["profile"])
+    finally:
+        server.shutdown()
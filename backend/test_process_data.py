@@ -8,13 +8,13 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-from main import startup_event, process_data, profiles, Profile
+import Main
+from Main import process_data, get_or_create_profile
 
 async def run_test():
-    # Ensure at least one profile exists
-    global profiles
-
-    await startup_event()
+    # Load the prompt the way the server lifespan does and ensure the profile exists
+    Main.prompt_template = Main.load_prompt_template()
+    get_or_create_profile("TestUser")
 
     # Fake data packet (like transcription would generate)
     timestamp = time.time()
@@ -0,0 +1,264 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("livekit.rtc")
+from livekit import rtc
+
+from room_agent import RoomAgentManager
+
+
+class FakeRoom:
+    """Stands in for rtc.Room; connect() fails while FakeRoom.failures is positive."""
+
+    instances = []
+    failures = 0
+
+    def __init__(self):
+        self.handlers = {}
+        self.connected = False
+        self.published = []
+        self.local_participant = SimpleNamespace(publish_data=self._publish_data)
+        FakeRoom.instances.append(self)
+
+    async def _publish_data(self, payload, **kwargs):
+        self.published.append(payload)
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def connect(self, url, token, options=None):
+        await asyncio.sleep(0)  # Yield like a real handshake, so concurrent joins interleave
+        if FakeRoom.failures:
+            FakeRoom.failures -= 1
+            raise ConnectionError("connection refused")
+        self.connected = True
+
+    def isconnected(self):
+        return self.connected
+
+    async def disconnect(self):
+        self.connected = False
+
+    def drop(self, reason="SIGNAL_CLOSE"):
+        self.connected = False
+        self.handlers["disconnected"](rtc.DisconnectReason.Value(reason))
+
+
+@pytest.fixture
+def fake_room(monkeypatch):
+    FakeRoom.instances = []
+    FakeRoom.failures = 0
+    monkeypatch.setattr(rtc, "Room", FakeRoom)
+    return FakeRoom
+
+
+class FakeAudioStream:
+    """Stands in for rtc.AudioStream; yields nothing until closed."""
+
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    @classmethod
+    def from_track(cls, **kwargs):
+        return cls()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.closed.wait()
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed.set()
+
+
+class FakeService:
+    def __init__(self):
+        self.finished = 0
+
+    async def finish(self, executor=None):
+        self.finished += 1
+        return {"type": "final", "text": "bye"}
+
+
+def subscribe(room, identity="alice", sid="TR_1"):
+    track = SimpleNamespace(kind=rtc.TrackKind.KIND_AUDIO, sid=sid)
+    room.handlers["track_subscribed"](track, None, SimpleNamespace(identity=identity))
+    return track
+
+
+def make_manager(service_factory=lambda identity, emit, room: None):
+    return RoomAgentManager(
+        "ws://localhost:7880",
+        token_factory=lambda *args, **kwargs: "token",
+        service_factory=service_factory,
+        reconnect_min=0.01,
+        reconnect_max=0.02,
+    )
+
+
+async def wait_until(condition, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.005)
+
+
+def test_agent_rejoins_after_disconnect(fake_room):
+    async def run():
+        manager = make_manager()
+        agent = await manager.join("room")
+        fake_room.failures = 2
+        fake_room.instances[-1].drop()
+
+        assert not agent.status()["connected"]
+        await wait_until(lambda: agent.status()["connected"])
+        assert agent.reconnects == 1
+        assert len(fake_room.instances) == 4  # Initial join, two failed attempts, the rejoin
+        # The manager still hands out the same, now reconnected, agent
+        assert await manager.join("room") is agent
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_join_with_retry_keeps_trying_when_the_server_is_down(fake_room):
+    async def run():
+        manager = make_manager()
+        fake_room.failures = 3
+        agent = await manager.join("room", retry=True)
+        assert manager.agents["room"] is agent
+        assert agent.status()["reconnecting"]
+        await wait_until(lambda: agent.status()["connected"])
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_join_without_retry_raises_and_is_not_kept(fake_room):
+    async def run():
+        manager = make_manager()
+        fake_room.failures = 1
+        with pytest.raises(ConnectionError):
+            await manager.join("room")
+        assert "room" not in manager.agents
+
+    asyncio.run(run())
+
+
+def test_leaving_stops_reconnect_attempts(fake_room):
+    async def run():
+        manager = make_manager()
+        agent = await manager.join("room")
+        fake_room.failures = 1000
+        fake_room.instances[-1].drop()
+        await wait_until(lambda: agent.status()["reconnecting"])
+
+        assert await manager.leave("room")
+        attempts = len(fake_room.instances)
+        await asyncio.sleep(0.05)
+        assert len(fake_room.instances) == attempts
+        assert not agent.status()["reconnecting"]
+
+    asyncio.run(run())
+
+
+def test_concurrent_joins_share_one_agent(fake_room):
+    async def run():
+        manager = make_manager()
+        first, second = await asyncio.gather(manager.join("room"), manager.join("room", retry=True))
+        assert first is second
+        assert len(fake_room.instances) == 1
+        await manager.stop()
+        assert not any(room.connected for room in fake_room.instances)
+
+    asyncio.run(run())
+
+
+def test_leaving_during_join_does_not_leave_a_connected_agent(fake_room):
+    async def run():
+        manager = make_manager()
+        join = asyncio.create_task(manager.join("room"))
+        await asyncio.sleep(0)  # Join is now waiting in connect()
+        assert await manager.leave("room")
+        await join
+        assert "room" not in manager.agents
+        assert not any(room.connected for room in fake_room.instances)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("reason", ["DUPLICATE_IDENTITY", "PARTICIPANT_REMOVED", "ROOM_DELETED", "ROOM_CLOSED"])
+def test_agent_stops_when_removed_from_the_room(fake_room, reason):
+    async def run():
+        manager = make_manager()
+        agent = await manager.join("room")
+        fake_room.instances[-1].drop(reason=reason)
+
+        assert "room" not in manager.agents
+        assert not agent.status()["reconnecting"]
+        await asyncio.sleep(0.05)
+        assert len(fake_room.instances) == 1
+        # A later join starts a fresh agent
+        assert await manager.join("room") is not agent
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("reason", ["CONNECTION_TIMEOUT", "SERVER_SHUTDOWN", "MIGRATION", "UNKNOWN_REASON"])
+def test_agent_rejoins_after_transient_disconnects(fake_room, reason):
+    async def run():
+        manager = make_manager()
+        agent = await manager.join("room")
+        fake_room.instances[-1].drop(reason=reason)
+        await wait_until(lambda: agent.status()["connected"])
+        assert manager.agents["room"] is agent
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    monkeypatch.setattr(rtc, "AudioStream", FakeAudioStream)
+
+
+def test_unsubscribe_flushes_the_utterance_in_progress(fake_room, fake_stream):
+    async def run():
+        service = FakeService()
+        manager = make_manager(lambda identity, emit, room: service)
+        agent = await manager.join("room")
+        room = fake_room.instances[-1]
+        track = subscribe(room)
+        await asyncio.sleep(0.01)
+
+        room.handlers["track_unsubscribed"](track, None, None)
+        await wait_until(lambda: not agent.ingests)
+        assert service.finished == 1
+        assert len(room.published) == 1
+        await manager.stop()
+
+    asyncio.run(run())
+
+
+def test_lost_connection_skips_the_final_analysis(fake_room, fake_stream):
+    async def run():
+        service = FakeService()
+        manager = make_manager(lambda identity, emit, room: service)
+        agent = await manager.join("room")
+        room = fake_room.instances[-1]
+        subscribe(room)
+        await asyncio.sleep(0.01)
+
+        room.drop()
+        await wait_until(lambda: not agent.ingests)
+        assert service.finished == 0
+        assert room.published == []
+        await manager.stop()
+
+    asyncio.run(run())
@@ -7,6 +7,7 @@ import {
   ParticipantTile,
   RoomAudioRenderer,
   VideoConference,
+  useDataChannel,
   useTracks,
 } from '@livekit/components-react';
 import { Track } from 'livekit-client';
@@ -61,7 +62,7 @@ export const CallScreen = ({ roomName, participantName, backendUrl, meetingCode,
 
     const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     const domain = new URL(effectiveBackendUrl).host;
-    const url = `${wsProtocol}//${domain}/ws/transcribe/${effectiveParticipantName}`;
+    const url = `${wsProtocol}//${domain}/ws/transcribe/${effectiveParticipantName}?room=${encodeURIComponent(effectiveRoomName)}`;
 
     console.log(`🚀 Attempting to connect WebSocket to: ${url}`);
     const newWs = new WebSocket(url);
@@ -97,7 +98,7 @@ export const CallScreen = ({ roomName, participantName, backendUrl, meetingCode,
     return () => {
       newWs.close();
     };
-  }, [token, effectiveParticipantName, effectiveBackendUrl]); // This effect runs only when these details change.
+  }, [token, effectiveParticipantName, effectiveRoomName, effectiveBackendUrl]); // This effect runs only when these details change.
 
   // Step 3: This function is called by LiveKit *after* it connects to the room.
   const onConnected = () => {
@@ -120,6 +121,18 @@ export const CallScreen = ({ roomName, participantName, backendUrl, meetingCode,
       { onlySubscribed: false },
     );
 
+    // Results from the backend room agent, which transcribes our LiveKit audio server-side
+    useDataChannel('reactions', (msg) => {
+      try {
+        const message: TranscriptMessage = JSON.parse(new TextDecoder().decode(msg.payload));
+        if (message.transcript) {
+          setLatestTranscript(message.transcript);
+        }
+      } catch (error) {
+        console.error('Failed to parse reaction data message:', error);
+      }
+    });
+
     return (
       <VideoConference>
         <GridLayout tracks={tracks}>